@@ -0,0 +1,112 @@
+"""
+Batch Manifest
+Remembers which files an operation has already processed, so re-runs over
+the same tree skip everything that hasn't changed since its last successful run.
+Stored as a small SQLite file in the root folder.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+
+MANIFEST_NAME = ".batch_manifest.sqlite"
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def settings_hash(settings):
+    """Stable hash of an operation's settings (any JSON-serializable dict)"""
+    data = json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+class Manifest:
+    """Per-file record of (size, mtime, content hash) for one operation and its settings.
+
+    A file is skipped when the same operation already ran on it with the same
+    settings and its size and mtime are unchanged. When only the mtime moved,
+    the content hash decides. If the run wrote an output file elsewhere, that
+    file must still exist too. Records are keyed by path relative to the root
+    folder, so a share mounted under another drive letter still matches.
+    """
+
+    def __init__(self, root_folder, operation, settings):
+        self.root_folder = root_folder
+        self.operation = operation
+        self.settings_hash = settings_hash(settings)
+        self.db = sqlite3.connect(os.path.join(root_folder, MANIFEST_NAME))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS processed ("
+            " path TEXT NOT NULL, operation TEXT NOT NULL, settings_hash TEXT NOT NULL,"
+            " size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, sha256 TEXT NOT NULL,"
+            " output TEXT, PRIMARY KEY (path, operation))"
+        )
+        # Manifests written before outputs were tracked
+        if "output" not in [row[1] for row in self.db.execute("PRAGMA table_info(processed)")]:
+            self.db.execute("ALTER TABLE processed ADD COLUMN output TEXT")
+        self._pending = 0
+
+    def _key(self, path):
+        return os.path.relpath(path, self.root_folder)
+
+    def is_done(self, path):
+        """True if path is unchanged since its last successful run with these settings"""
+        row = self.db.execute(
+            "SELECT settings_hash, size, mtime_ns, sha256, output FROM processed"
+            " WHERE path = ? AND operation = ?",
+            (self._key(path), self.operation)
+        ).fetchone()
+        if row is None or row[0] != self.settings_hash:
+            return False
+        if row[4] is not None and not os.path.exists(row[4]):
+            return False  # The output it wrote was deleted or moved
+
+        stat = os.stat(path)
+        if stat.st_size != row[1]:
+            return False
+        if stat.st_mtime_ns == row[2]:
+            return True
+
+        # Touched but possibly not changed (copied back, date reset): compare contents
+        if file_hash(path) != row[3]:
+            return False
+        self._write(path, stat, row[3], row[4])
+        return True
+
+    def record(self, path, output=None):
+        """Remember path (in its current state) as successfully processed.
+
+        output: the file the run wrote for it, if not path itself; path only
+        counts as done while that file exists.
+        """
+        self._write(path, os.stat(path), file_hash(path), output and os.path.abspath(output))
+
+    def _write(self, path, stat, sha256, output=None):
+        self.db.execute(
+            "INSERT OR REPLACE INTO processed (path, operation, settings_hash, size, mtime_ns, sha256, output)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self._key(path), self.operation, self.settings_hash,
+             stat.st_size, stat.st_mtime_ns, sha256, output)
+        )
+        self._pending += 1
+        if self._pending >= 100:
+            self.db.commit()
+            self._pending = 0
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
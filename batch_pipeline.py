@@ -0,0 +1,158 @@
+"""
+Batch Pipeline
+Overlaps reading, processing and writing for batch runs on slow storage.
+Reader threads fetch the next files while worker processes edit the ones
+already in memory, and writer threads save the results, so the disk (or
+network share) and the CPUs are busy at the same time. A memory budget
+caps the bytes held across all three stages: readers wait while it is
+spent, and it is handed back as files are written.
+"""
+
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class MemoryBudget:
+    """Bytes held by files in flight. acquire() blocks while the budget is spent."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        # A file larger than the whole budget still gets through, on its own
+        with self.condition:
+            self.condition.wait_for(lambda: self.used == 0 or self.used + size <= self.limit)
+            self.used += size
+
+    def resize(self, old_size, new_size):
+        """Swap a held amount for another without waiting (input bytes for output bytes)."""
+        with self.condition:
+            self.used += new_size - old_size
+            self.condition.notify_all()
+
+    def release(self, size):
+        self.resize(size, 0)
+
+
+def write_bytes(path, data):
+    """Replace path with data through a temp file, so a failed write leaves the original."""
+    temp_path = path + ".tmp"
+    try:
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+class _Job:
+    """One file on its way through the three stages."""
+
+    def __init__(self, path, budget):
+        self.path = path
+        self.budget = budget
+        self.held = 0  # Bytes of the budget this file holds right now
+        self.done = Future()
+
+    def read(self, buffer_limit):
+        size = os.path.getsize(self.path)
+        if size > buffer_limit:
+            return None  # Too big to buffer: the process function reads it itself
+        self.budget.acquire(size)
+        self.held = size
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+    def hold(self, size):
+        self.budget.resize(self.held, size)
+        self.held = size
+
+    def finish(self, result=None, error=None):
+        self.hold(0)
+        if error is None:
+            self.done.set_result(result)
+        else:
+            self.done.set_exception(error)
+
+
+def run_pipeline(paths, process, executor=None, io_threads=4, memory_budget_mb=512,
+                 buffer_limit_mb=None, window=None):
+    """Run process over paths, overlapping reads, processing and writes.
+
+    process(path, data) gets the file's bytes and returns (result, new_bytes);
+    new_bytes is written back to path unless it is None. Files larger than
+    buffer_limit_mb (default: the whole budget) are passed with data=None,
+    and process reads and saves those itself. process runs on executor (a
+    ProcessPoolExecutor, so it must be picklable) or, without one, on a
+    single thread, which still overlaps it with the I/O.
+
+    paths is consumed lazily, with at most window files in flight (default
+    4 per I/O thread). Yields (path, result, error) in the order of paths,
+    each once its file has been written; error is the exception raised while
+    reading, processing or writing it (result is then None).
+    """
+    budget = MemoryBudget(memory_budget_mb * 1e6)
+    buffer_limit = (buffer_limit_mb if buffer_limit_mb is not None else memory_budget_mb) * 1e6
+    window = window or io_threads * 4
+    readers = ThreadPoolExecutor(max_workers=io_threads)
+    writers = ThreadPoolExecutor(max_workers=io_threads)
+    own_executor = ThreadPoolExecutor(max_workers=1) if executor is None else None
+    cpu = executor or own_executor
+
+    # Each stage hands the file on from the previous stage's done callback
+    def after_read(job, future):
+        try:
+            data = future.result()
+            cpu.submit(process, job.path, data).add_done_callback(lambda f: after_process(job, f))
+        except BaseException as e:
+            job.finish(error=e)
+
+    def after_process(job, future):
+        try:
+            result, output = future.result()
+            if output is None:
+                job.finish(result)
+                return
+            job.hold(len(output))
+            writers.submit(write_bytes, job.path, output).add_done_callback(
+                lambda f: after_write(job, f, result))
+        except BaseException as e:
+            job.finish(error=e)
+
+    def after_write(job, future, result):
+        try:
+            future.result()
+            job.finish(result)
+        except BaseException as e:
+            job.finish(error=e)
+
+    def start(path):
+        job = _Job(path, budget)
+        readers.submit(job.read, buffer_limit).add_done_callback(lambda f: after_read(job, f))
+        return job
+
+    def outcome(job):
+        try:
+            return job.path, job.done.result(), None
+        except Exception as e:
+            return job.path, None, e
+
+    pending = deque()
+    try:
+        for path in paths:
+            pending.append(start(path))
+            if len(pending) >= window:
+                yield outcome(pending.popleft())
+        while pending:
+            yield outcome(pending.popleft())
+    finally:
+        # Reads not started yet are dropped; writes already handed over still complete
+        readers.shutdown(cancel_futures=True)
+        if own_executor is not None:
+            own_executor.shutdown()
+        writers.shutdown()
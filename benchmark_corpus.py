@@ -0,0 +1,141 @@
+"""
+Benchmark Corpus
+Generates reproducible synthetic corpora for the benchmarks: .docx files with
+many small runs, tables, headers/footers and editing protection, .xlsx files
+with large shared-string tables, and multi-page PDFs. The same seed and sizes
+always give the same files; hit_density controls how much of the text
+contains the search term / redaction triggers.
+"""
+
+import os
+import random
+import fitz  # PyMuPDF
+from docx import Document
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from openpyxl import Workbook
+
+HIT_TERM = "VEM FORMS REMOVED FOR MANUAL REVISION"  # find_text of the docx replace script
+XLSX_HIT_TERM = "Belships"  # find_text of the xlsx replace script
+PDF_TRIGGERS = ["Confidential", "surveyor@example.com", "IMO 9123456", "+47 555 12345"]
+
+WORDS = (
+    "vessel survey hull inspection cargo deck engine report safety crew master owner "
+    "certificate class port voyage tank ballast maintenance record form revision issue "
+    "procedure section manual company office approval date signature remarks"
+).split()
+
+# Small / default / large corpus sizes
+SCALES = {
+    "small": dict(docx_files=5, paragraphs=60, runs_per_paragraph=6, tables=2,
+                  xlsx_files=3, rows=300, columns=6, pdf_files=2, pages=10),
+    "default": dict(docx_files=20, paragraphs=200, runs_per_paragraph=8, tables=4,
+                    xlsx_files=10, rows=2000, columns=8, pdf_files=5, pages=40),
+    "large": dict(docx_files=100, paragraphs=800, runs_per_paragraph=10, tables=10,
+                  xlsx_files=30, rows=10000, columns=10, pdf_files=10, pages=200),
+}
+
+
+def sentence(rng, words=12, hit=False, term=HIT_TERM):
+    """Random sentence; with hit, term is placed somewhere in it."""
+    parts = [rng.choice(WORDS) for _ in range(words)]
+    if hit:
+        parts.insert(rng.randrange(len(parts) + 1), term)
+    return " ".join(parts).capitalize() + "."
+
+
+def add_runs(paragraph, text, rng, runs):
+    """Split text over about `runs` runs with alternating formatting, like edited Word text."""
+    cuts = sorted(rng.sample(range(1, len(text)), min(runs - 1, len(text) - 1)))
+    for i, (start, end) in enumerate(zip([0] + cuts, cuts + [len(text)])):
+        run = paragraph.add_run(text[start:end])
+        run.bold = i % 3 == 1
+        run.italic = i % 5 == 2
+
+
+def protect(doc):
+    """Add read-only editing protection to word/settings.xml."""
+    protection = OxmlElement("w:documentProtection")
+    protection.set(qn("w:edit"), "readOnly")
+    protection.set(qn("w:enforcement"), "1")
+    doc.settings.element.append(protection)
+
+
+def make_docx(path, rng, paragraphs, runs_per_paragraph, tables, hit_density):
+    doc = Document()
+    section = doc.sections[0]
+    section.header.paragraphs[0].text = "Old header " + sentence(rng, 4)
+    section.footer.paragraphs[0].text = "Page 1 of 3"
+    section.footer.add_paragraph("Revision Number: 2")
+
+    table_every = max(paragraphs // (tables + 1), 1)
+    for i in range(paragraphs):
+        style = "Heading 1" if i % 25 == 0 else None
+        p = doc.add_paragraph(style=style)
+        add_runs(p, sentence(rng, hit=rng.random() < hit_density), rng, runs_per_paragraph)
+        if tables and i % table_every == table_every - 1:
+            table = doc.add_table(rows=4, cols=3)
+            for cell in table._cells:
+                add_runs(cell.paragraphs[0], sentence(rng, 5, hit=rng.random() < hit_density), rng, 3)
+            tables -= 1
+
+    protect(doc)
+    doc.save(path)
+
+
+def make_xlsx(path, rng, rows, columns, hit_density):
+    wb = Workbook()
+    ws = wb.active
+    for sheet in range(2):
+        if sheet:
+            ws = wb.create_sheet(f"Sheet{sheet + 1}")
+        for r in range(1, rows // 2 + 1):
+            for c in range(1, columns + 1):
+                if c == 1:
+                    ws.cell(r, c, r)  # a number column, like real forms
+                else:
+                    # Mostly unique strings, so the shared-string table gets large
+                    hit = rng.random() < hit_density
+                    ws.cell(r, c, f"{sentence(rng, 4, hit=hit, term=XLSX_HIT_TERM)} #{r}-{c}")
+    wb.save(path)
+
+
+def make_pdf(path, rng, pages, hit_density):
+    doc = fitz.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        y = 72
+        for block in range(8):
+            lines = [sentence(rng, 8) for _ in range(3)]
+            if rng.random() < hit_density:
+                lines[rng.randrange(3)] += " " + rng.choice(PDF_TRIGGERS)
+            page.insert_text((72, y), "\n".join(lines), fontsize=9)
+            y += 80
+    doc.save(path)
+    doc.close()
+
+
+def generate_corpus(folder, scale="default", hit_density=0.05, seed=1):
+    """Write the corpus into folder/docx, folder/xlsx and folder/pdf.
+
+    Returns {"docx": [...], "xlsx": [...], "pdf": [...]} with the file paths.
+    """
+    sizes = SCALES[scale]
+    rng = random.Random(seed)
+    files = {"docx": [], "xlsx": [], "pdf": []}
+    for kind in files:
+        os.makedirs(os.path.join(folder, kind), exist_ok=True)
+
+    for i in range(sizes["docx_files"]):
+        path = os.path.join(folder, "docx", f"form_{i:04d}.docx")
+        make_docx(path, rng, sizes["paragraphs"], sizes["runs_per_paragraph"], sizes["tables"], hit_density)
+        files["docx"].append(path)
+    for i in range(sizes["xlsx_files"]):
+        path = os.path.join(folder, "xlsx", f"sheet_{i:04d}.xlsx")
+        make_xlsx(path, rng, sizes["rows"], sizes["columns"], hit_density)
+        files["xlsx"].append(path)
+    for i in range(sizes["pdf_files"]):
+        path = os.path.join(folder, "pdf", f"report_{i:04d}.pdf")
+        make_pdf(path, rng, sizes["pages"], hit_density)
+        files["pdf"].append(path)
+    return files
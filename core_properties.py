@@ -0,0 +1,116 @@
+"""
+Core Properties
+Reads docProps/core.xml from an open .docx/.xlsx/.xlsm package for the
+scripts that edit it in place (author, dates). A package without the part
+gets an empty one, along with the content type and relationship it needs.
+Also sets the author (and company in docProps/app.xml) of a whole file.
+"""
+
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from ooxml_package import rewrite_package
+
+CORE_PART = "docProps/core.xml"
+
+CORE_NS = {
+    "cp": "http://schemas.openxmlformats.org/package/2006/metadata/core-properties",
+    "dc": "http://purl.org/dc/elements/1.1/",
+    "dcterms": "http://purl.org/dc/terms/",
+    "dcmitype": "http://purl.org/dc/dcmitype/",
+    "xsi": "http://www.w3.org/2001/XMLSchema-instance",
+}
+
+APP_PART = "docProps/app.xml"
+APP_NS = "http://schemas.openxmlformats.org/officeDocument/2006/extended-properties"
+
+# Keep the usual Office prefixes when the XML is written back
+for prefix, uri in CORE_NS.items():
+    ET.register_namespace(prefix, uri)
+ET.register_namespace("", APP_NS)
+ET.register_namespace("vt", "http://schemas.openxmlformats.org/officeDocument/2006/docPropsVTypes")
+
+EMPTY_CORE_XML = (
+    '<cp:coreProperties'
+    + "".join(f' xmlns:{prefix}="{uri}"' for prefix, uri in CORE_NS.items())
+    + '/>'
+)
+
+
+def set_child_text(parent, tag, value):
+    """Set the text of parent's child element tag, creating it if missing. Returns the old text."""
+    child = parent.find(tag)
+    if child is None:
+        child = ET.SubElement(parent, tag)
+    old_value = child.text
+    child.text = value
+    return old_value
+
+
+def core_part_references(zin):
+    """Content type override and package relationship for a newly added core.xml (unless already there)."""
+    references = {}
+    content_types = zin.read("[Content_Types].xml").decode("utf-8")
+    if 'PartName="/docProps/core.xml"' not in content_types:
+        content_types = content_types.replace(
+            "</Types>",
+            '<Override PartName="/docProps/core.xml" '
+            'ContentType="application/vnd.openxmlformats-package.core-properties+xml"/></Types>'
+        )
+        references["[Content_Types].xml"] = content_types.encode("utf-8")
+    rels = zin.read("_rels/.rels").decode("utf-8")
+    if "/relationships/metadata/core-properties" not in rels:
+        rels = rels.replace(
+            "</Relationships>",
+            '<Relationship Id="rIdCoreProps" '
+            'Type="http://schemas.openxmlformats.org/package/2006/relationships/metadata/core-properties" '
+            'Target="docProps/core.xml"/></Relationships>'
+        )
+        references["_rels/.rels"] = rels.encode("utf-8")
+    return references
+
+
+def read_core(zin):
+    """Parse the package's core.xml.
+
+    Returns (root element, added_parts): added_parts is empty if the part
+    exists, else the package entries that must change so a newly written
+    core.xml is found (the caller writes core.xml itself).
+    """
+    if CORE_PART in zin.NameToInfo:
+        return ET.fromstring(zin.read(CORE_PART)), {}
+    return ET.fromstring(EMPTY_CORE_XML), core_part_references(zin)
+
+
+def update_author(path, new_author, new_company=None):
+    """Set creator and lastModifiedBy by editing docProps/core.xml inside the package.
+
+    Works the same for .docx, .xlsx and .xlsm. If new_company is given, Company in
+    docProps/app.xml is set too. All other parts are copied byte-for-byte, and a
+    file that already has these values is not rewritten at all.
+    Returns (previous creator, rewritten).
+    """
+    temp_path = path + ".tmp"
+    try:
+        with zipfile.ZipFile(path, 'r') as zin:
+            core, replaced_parts = read_core(zin)
+
+            old_author = set_child_text(core, f"{{{CORE_NS['dc']}}}creator", new_author)
+            old_modified_by = set_child_text(core, f"{{{CORE_NS['cp']}}}lastModifiedBy", new_author)
+            if CORE_PART not in zin.NameToInfo or (old_author, old_modified_by) != (new_author, new_author):
+                replaced_parts[CORE_PART] = ET.tostring(core, encoding="UTF-8", xml_declaration=True)
+
+            if new_company is not None and APP_PART in zin.NameToInfo:
+                app = ET.fromstring(zin.read(APP_PART))
+                if set_child_text(app, f"{{{APP_NS}}}Company", new_company) != new_company:
+                    replaced_parts[APP_PART] = ET.tostring(app, encoding="UTF-8", xml_declaration=True)
+
+            if not replaced_parts:
+                return old_author, False
+            rewrite_package(zin, temp_path, replaced_parts)
+
+        os.replace(temp_path, path)
+        return old_author, True
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,91 @@
+"""
+Date Normalize
+Sets an Office file's dates in one operation: dcterms:created and
+dcterms:modified in docProps/core.xml (rewritten at the ZIP-part level,
+every other entry copied still compressed), then the file's access and
+modification times. Works the same for .docx, .xlsx and .xlsm. Files are
+handled on a thread pool, since on a network share each one is mostly
+waiting on round trips.
+"""
+
+import datetime
+import os
+import zipfile
+import xml.etree.ElementTree as ET
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from core_properties import CORE_NS, CORE_PART, read_core
+from ooxml_package import rewrite_package
+
+DATE_TAGS = (f"{{{CORE_NS['dcterms']}}}created", f"{{{CORE_NS['dcterms']}}}modified")
+XSI_TYPE = f"{{{CORE_NS['xsi']}}}type"
+
+
+def core_date(timestamp):
+    """W3CDTF value for core.xml (UTC, whole seconds), e.g. 2025-10-22T00:00:00Z"""
+    return datetime.datetime.fromtimestamp(timestamp, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def set_core_dates(path, timestamp):
+    """Set dcterms:created and dcterms:modified in the package's core.xml.
+
+    A file whose core.xml already holds these dates is not rewritten.
+    Returns True if the file was rewritten.
+    """
+    value = core_date(timestamp)
+    temp_path = path + ".tmp"
+    try:
+        with zipfile.ZipFile(path, 'r') as zin:
+            core, replaced_parts = read_core(zin)
+            changed = CORE_PART not in zin.NameToInfo
+            for tag in DATE_TAGS:
+                element = core.find(tag)
+                if element is None:
+                    element = ET.SubElement(core, tag)
+                if element.text != value or element.get(XSI_TYPE) != "dcterms:W3CDTF":
+                    element.text = value
+                    element.set(XSI_TYPE, "dcterms:W3CDTF")
+                    changed = True
+            if not changed:
+                return False
+
+            replaced_parts[CORE_PART] = ET.tostring(core, encoding="UTF-8", xml_declaration=True)
+            rewrite_package(zin, temp_path, replaced_parts)
+
+        os.replace(temp_path, path)
+        return True
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def normalize_dates(path, timestamp, core_dates=True):
+    """Set the core.xml dates (if core_dates), then the file times. Returns True if the package was rewritten."""
+    rewritten = set_core_dates(path, timestamp) if core_dates else False
+    # Last, so the rewrite above doesn't leave today's modification time behind
+    os.utime(path, (timestamp, timestamp))
+    return rewritten
+
+
+def normalize_all(paths, timestamp, core_dates=True, workers=16):
+    """normalize_dates() for every path, on a thread pool.
+
+    paths is consumed lazily. Yields (path, rewritten, error) in the order
+    of paths; error is the exception raised for that file, or None.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+
+        def next_result():
+            path, future = pending.popleft()
+            try:
+                return path, future.result(), None
+            except Exception as e:
+                return path, False, e
+
+        for path in paths:
+            pending.append((path, pool.submit(normalize_dates, path, timestamp, core_dates)))
+            if len(pending) >= workers * 4:
+                yield next_result()
+        while pending:
+            yield next_result()
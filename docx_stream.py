@@ -0,0 +1,236 @@
+"""
+DOCX Stream
+Find/replace in the story parts of a .docx without loading the document.
+Each part is inflated in chunks and cut into top-level paragraphs. Only the
+paragraphs whose text can contain a find term are parsed, one at a time,
+and edited with the same run-preserving editor as the python-docx path;
+everything else is copied to the output ZIP entry byte for byte. Peak
+memory is bounded by the largest paragraph, not by the document.
+"""
+
+import codecs
+import copy
+import os
+import re
+import zipfile
+from collections import Counter
+from html import unescape
+from lxml import etree
+from ooxml_package import copy_entry_raw
+from text_replace import ParagraphTextIndex
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+CHUNK_SIZE = 1 << 20  # Characters read (and written) at a time
+
+# Story parts: body (incl. tables), headers and footers
+STORY_PART_RE = re.compile(r"word/(document|header\d*|footer\d*)\.xml")
+# Rest of a tag after its name, up to the closing '>' (attribute values may contain '>')
+TAG_END_RE = re.compile(r"""(?:[^>"']|"[^"]*"|'[^']*')*>""")
+NS_DECL_RE = re.compile(r"""\sxmlns(?::([\w.-]+))?\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+ENCODING_RE = re.compile(r"""^\ufeff?<\?xml[^>]*\sencoding\s*=\s*["']([\w.-]+)["']""")
+
+PARSER = etree.XMLParser(huge_tree=True)
+
+
+class UnsupportedStory(ValueError):
+    """The part uses XML the paragraph scanner doesn't handle (comments, CDATA, another encoding, ...)."""
+
+
+class StoryReader:
+    """Splits a story part into its top-level paragraphs and the XML between them.
+
+    Paragraphs nested in a paragraph (text boxes) stay part of the outer one.
+    Joined together, the segments give back the part unchanged.
+    """
+
+    def __init__(self, src):
+        self.src = src
+        self.decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer = ""
+        self.eof = False
+
+        # Read up to the end of the root start tag, which declares the namespaces
+        while True:
+            root = re.search(r"<(?![?!])", self.buffer)
+            end = root and TAG_END_RE.match(self.buffer, root.end())
+            if end:
+                break
+            if self.eof:
+                raise UnsupportedStory("no root element")
+            self._fill()
+        encoding = ENCODING_RE.match(self.buffer)
+        if encoding and encoding.group(1).lower().replace("-", "") != "utf8":
+            raise UnsupportedStory(f"encoding {encoding.group(1)}")
+        if "<!" in self.buffer[:root.start()]:
+            raise UnsupportedStory("comment or DOCTYPE before the root element")
+        self.body_start = end.end()
+
+        declarations = self.buffer[root.start():end.end()]
+        prefixes = [m.group(1) for m in NS_DECL_RE.finditer(declarations)
+                    if (m.group(2) if m.group(2) is not None else m.group(3)) == W_NS]
+        if not prefixes or prefixes[0] is None:
+            raise UnsupportedStory("WordprocessingML is not bound to a prefix")
+        prefix = re.escape(prefixes[0])
+        self.prefix_length = len(prefixes[0])
+        self.wrapper = "<wrapper" + "".join(m.group(0) for m in NS_DECL_RE.finditer(declarations)) + ">"
+        self.tag_re = re.compile(rf"<(?:(/?){prefix}:p(?=[\s/>])|[!?])")
+        # <w:t> text, and the tabs/breaks that separate it in the paragraph text
+        self.text_re = re.compile(rf"<{prefix}:t(?:\s[^>]*)?>([^<]*)</{prefix}:t>|<{prefix}:(tab|br|cr)(?=[\s/>])[^>]*>")
+        # Containers whose text the paragraph editor does not read, and which could sit between two runs
+        self.interleaved_re = re.compile(rf"<{prefix}:(?:p|sdt|customXml|moveTo|dir|bdo)(?=[\s/>])")
+
+    def _fill(self):
+        chunk = self.src.read(CHUNK_SIZE)
+        self.eof = not chunk
+        self.buffer += self.decoder.decode(chunk, final=self.eof)
+
+    def segments(self):
+        """Yield (is_paragraph, xml) pieces of the part, in order."""
+        yield False, self.buffer[:self.body_start]
+        pos = flushed = self.body_start  # where scanning continues / end of what was yielded
+        start = 0  # start of the open paragraph
+        depth = 0
+        while True:
+            # A tag starting before limit is complete enough to recognise
+            limit = len(self.buffer) if self.eof else len(self.buffer) - self.prefix_length - 4
+            while True:
+                match = self.tag_re.search(self.buffer, pos)
+                if match is None or match.start() >= limit:
+                    pos = max(pos, limit)
+                    break
+                if match.group(1) is None:
+                    raise UnsupportedStory("comment, CDATA or processing instruction in the body")
+                end = TAG_END_RE.match(self.buffer, match.end())
+                if end is None:
+                    if self.eof:
+                        raise UnsupportedStory("truncated tag")
+                    pos = match.start()
+                    break
+                pos = end.end()
+                if match.group(1):
+                    depth -= 1
+                    if depth < 0:
+                        raise UnsupportedStory("unbalanced paragraph end tag")
+                    if depth == 0:
+                        if start > flushed:
+                            yield False, self.buffer[flushed:start]
+                        yield True, self.buffer[start:pos]
+                        flushed = pos
+                elif self.buffer[pos - 2] != "/":
+                    if depth == 0:
+                        start = match.start()
+                    depth += 1
+
+            # Hand on what is settled and drop it, keeping the open paragraph (or the unscanned tail)
+            keep = start if depth else pos
+            if keep > flushed:
+                yield False, self.buffer[flushed:keep]
+            self.buffer = self.buffer[keep:]
+            pos -= keep
+            start = flushed = 0
+            if self.eof:
+                if depth:
+                    raise UnsupportedStory("paragraph not closed")
+                if self.buffer:
+                    yield False, self.buffer
+                return
+            self._fill()
+
+    def parse(self, xml):
+        """Parse one paragraph's XML; returns the wrapper element holding it."""
+        return etree.fromstring(self.wrapper + xml + "</wrapper>", PARSER)
+
+    def may_match(self, xml, table):
+        """False if the paragraph's text certainly doesn't contain a find term."""
+        if self.interleaved_re.search(xml, 1):
+            # Joining every <w:t> would glue in text the editor doesn't see; ask the editor
+            return bool(table.pattern.search(ParagraphTextIndex(self.parse(xml)[0]).text))
+        text = "".join(("\t" if special == "tab" else "\n") if special else unescape(t)
+                       for t, special in self.text_re.findall(xml))
+        return bool(table.pattern.search(text))
+
+    def replace(self, xml, table, hits):
+        """New XML for one paragraph, or None if nothing in it matched."""
+        wrapper = self.parse(xml)
+        if not ParagraphTextIndex(wrapper[0]).replace(table, hits):
+            return None
+        out = etree.tostring(wrapper, encoding="unicode")
+        return out[out.index(">") + 1:-len("</wrapper>")]
+
+
+def story_candidates(zin, table):
+    """ZipInfo of every story part with at least one paragraph that may contain a find term."""
+    candidates = []
+    for info in zin.infolist():
+        if not STORY_PART_RE.fullmatch(info.filename):
+            continue
+        with zin.open(info) as src:
+            reader = StoryReader(src)
+            if any(is_paragraph and reader.may_match(xml, table) for is_paragraph, xml in reader.segments()):
+                candidates.append(info)
+    return candidates
+
+
+def replace_in_story(src, dst, table, hits):
+    """Copy a story part from src to dst, replacing in its paragraphs. Returns the number of paragraphs changed."""
+    reader = StoryReader(src)
+    changed = 0
+    pending = []
+    pending_size = 0
+    for is_paragraph, xml in reader.segments():
+        if is_paragraph and reader.may_match(xml, table):
+            new_xml = reader.replace(xml, table, hits)
+            if new_xml is not None:
+                xml = new_xml
+                changed += 1
+        pending.append(xml)
+        pending_size += len(xml)
+        if pending_size >= CHUNK_SIZE:
+            dst.write("".join(pending).encode("utf-8"))
+            pending = []
+            pending_size = 0
+    dst.write("".join(pending).encode("utf-8"))
+    return changed
+
+
+def replace_in_docx(file_path, table, hits, timer):
+    """Stream-replace in the story parts of one .docx, in place.
+
+    Other entries, and story parts without a possible match, are copied
+    still compressed. The file is only replaced if a paragraph changed.
+    Returns the number of paragraphs changed. Raises UnsupportedStory if a
+    part can't be streamed; nothing is written or counted in that case.
+    """
+    temp_path = file_path + ".tmp"
+    file_hits = Counter()
+    changed = 0
+    try:
+        with zipfile.ZipFile(file_path, 'r') as zin:
+            with timer.phase("scan"):
+                candidates = story_candidates(zin, table)
+            timer.bytes_read += os.path.getsize(file_path)
+            if not candidates:
+                return 0
+
+            with timer.phase("rewrite"):
+                with zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zout:
+                    for info in zin.infolist():
+                        if info not in candidates:
+                            copy_entry_raw(zin, zout, info)
+                            continue
+                        out_info = copy.copy(info)
+                        out_info.compress_type = zipfile.ZIP_DEFLATED
+                        # Only switch to ZIP64 when the part could need it; older Office can't read it
+                        force_zip64 = info.file_size > zipfile.ZIP64_LIMIT // 2
+                        with zin.open(info) as src, zout.open(out_info, 'w', force_zip64=force_zip64) as dst:
+                            changed += replace_in_story(src, dst, table, file_hits)
+
+        if changed:
+            with timer.phase("write"):
+                os.replace(temp_path, file_path)
+            timer.bytes_written += os.path.getsize(file_path)
+            hits.update(file_hits)
+        return changed
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
@@ -0,0 +1,68 @@
+"""
+File Discovery
+Shared file enumeration for the batch scripts. Directory listings run on a
+thread pool (os.scandir), which hides most of the per-folder latency on
+network shares, while files are still yielded one by one in the same
+sorted top-down order every run. Office temp files and the output folder
+are filtered here, in one place.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+
+def is_skipped_name(name):
+    """Office lock/temp files (~$...)"""
+    return name.startswith("~$")
+
+
+def _scan(path):
+    """List one directory: (sorted subdirectory paths, sorted file paths)"""
+    dirs, files = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    dirs.append(entry.path)
+                elif entry.is_file():
+                    files.append(entry.path)
+    except OSError:
+        pass  # unreadable folder: treat as empty, like os.walk does
+    dirs.sort()
+    files.sort()
+    return dirs, files
+
+
+def iter_files(root_folder, extensions, exclude=(), recursive=True, workers=16, skip=None):
+    """Yield files under root_folder whose name ends with one of extensions.
+
+    Subfolders are listed concurrently as soon as their parent has been read,
+    and matching files are yielded as their folder becomes available, so
+    callers can start work before the whole tree is known. Folders in
+    exclude (e.g. the output folder) are not entered, and files whose name
+    skip(name) is true are left out (e.g. a script's own backups).
+    """
+    extensions = tuple(ext.lower() for ext in extensions)
+    excluded = {os.path.normcase(os.path.abspath(path)) for path in exclude}
+
+    pool = ThreadPoolExecutor(max_workers=workers)
+    try:
+        stack = [pool.submit(_scan, root_folder)]
+        while stack:
+            dirs, files = stack.pop().result()
+
+            if recursive:
+                # Start listing every subfolder now; they are consumed depth-first
+                children = [
+                    pool.submit(_scan, path) for path in dirs
+                    if os.path.normcase(os.path.abspath(path)) not in excluded
+                ]
+                stack.extend(reversed(children))
+
+            for path in files:
+                name = os.path.basename(path)
+                if (name.lower().endswith(extensions) and not is_skipped_name(name)
+                        and not (skip and skip(name))):
+                    yield path
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
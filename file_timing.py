@@ -0,0 +1,160 @@
+"""
+File Timing
+Per-file phase timings (read, parse, replace, serialize, write, ...) and
+bytes read/written for the batch scripts, written as JSON Lines, with a
+summary of the slowest files and phases at the end of a run. Optionally
+every file is profiled with cProfile or tracemalloc and the results of the
+N slowest files are kept.
+"""
+
+import cProfile
+import heapq
+import io
+import json
+import os
+import pstats
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+
+class FileTimer:
+    """Phase timings for one file.
+
+    Created where the file is processed (possibly in a worker process);
+    finish() returns a plain dict that can be sent back to the parent.
+    Phases should not nest: time outside all phases is reported as "other".
+    """
+
+    def __init__(self, path, profiler=None):
+        self.path = path
+        self.profiler = profiler
+        self.phases = {}
+        self.bytes_read = 0
+        self.bytes_written = 0
+        self._profile = None
+        if profiler == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif profiler == "tracemalloc":
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.clear_traces()
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def read_file(self, path):
+        """Read a whole file as bytes, timed as the "read" phase."""
+        with self.phase("read"):
+            with open(path, "rb") as f:
+                data = f.read()
+        self.bytes_read += len(data)
+        return data
+
+    def finish(self):
+        """Stop timing (and profiling) and return the record for this file."""
+        seconds = time.perf_counter() - self._start
+        record = {
+            "file": self.path,
+            "seconds": round(seconds, 6),
+            "phases": {name: round(value, 6) for name, value in self.phases.items()},
+            "bytes_read": self.bytes_read,
+            "bytes_written": self.bytes_written,
+        }
+        other = seconds - sum(self.phases.values())
+        if self.phases and other > 0:
+            record["phases"]["other"] = round(other, 6)
+
+        if self._profile is not None:
+            self._profile.disable()
+            fd, profile_path = tempfile.mkstemp(prefix="file_timing_", suffix=".prof")
+            os.close(fd)
+            self._profile.dump_stats(profile_path)
+            record["profile"] = profile_path
+        elif self.profiler == "tracemalloc":
+            record["peak_memory"] = tracemalloc.get_traced_memory()[1]
+            top = tracemalloc.take_snapshot().statistics("lineno")[:10]
+            record["top_allocations"] = [f"{stat.size / 1024:.1f} KiB  {stat.traceback}" for stat in top]
+        return record
+
+
+class RunTimer:
+    """Collects the FileTimer records of one run.
+
+    log_path: JSON Lines file, one record per file (None = don't write).
+    profile_slowest: profile every file with profiler ("cprofile" or
+    "tracemalloc") and keep the details of this many slowest files.
+    """
+
+    def __init__(self, log_path=None, profile_slowest=0, profiler="cprofile"):
+        self.profile_slowest = profile_slowest
+        self.profiler = profiler if profile_slowest else None
+        self.records = []
+        self._slowest = []  # min-heap of (seconds, n, record) holding the N slowest profiled files
+        self._log = open(log_path, "a", encoding="utf-8") if log_path else None
+
+    def start(self, path):
+        return FileTimer(path, self.profiler)
+
+    def add(self, record):
+        """Store a finished FileTimer record (from this process or a worker)."""
+        self.records.append(record)
+        if self._log:
+            self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+        if self.profiler:
+            entry = (record["seconds"], len(self.records), record)
+            if len(self._slowest) < self.profile_slowest:
+                heapq.heappush(self._slowest, entry)
+                return
+            dropped = heapq.heappushpop(self._slowest, entry)[2]
+        else:
+            dropped = record
+        # Profiles of files that are not among the slowest are not needed
+        if "profile" in dropped and os.path.exists(dropped["profile"]):
+            os.remove(dropped["profile"])
+
+    def summary(self, top=10):
+        """Print the slowest files with their phases, the time per phase, and the kept profiles."""
+        if self._log:
+            self._log.close()
+            self._log = None
+        if not self.records:
+            return
+
+        total = sum(record["seconds"] for record in self.records)
+        phases = {}
+        for record in self.records:
+            for name, seconds in record["phases"].items():
+                phases[name] = phases.get(name, 0.0) + seconds
+
+        print(f"\n⏱️ {len(self.records)} files in {total:.2f}s of processing time")
+        for name, seconds in sorted(phases.items(), key=lambda item: -item[1]):
+            print(f"   {name:<12}{seconds:>10.2f}s {seconds / total:>6.0%}" if total else f"   {name}")
+
+        print(f"\n🐢 Slowest {min(top, len(self.records))} files:")
+        for record in heapq.nlargest(top, self.records, key=lambda record: record["seconds"]):
+            slowest_phases = sorted(record["phases"].items(), key=lambda item: -item[1])[:4]
+            parts = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in slowest_phases)
+            print(f"   {record['seconds']:>8.2f}s  {record['file']}  ({parts})")
+
+        for seconds, n, record in sorted(self._slowest, reverse=True):
+            print(f"\n🔬 {record['file']} ({seconds:.2f}s)")
+            if "profile" in record:
+                out = io.StringIO()
+                pstats.Stats(record["profile"], stream=out).sort_stats("cumulative").print_stats(15)
+                print(out.getvalue().rstrip())
+                print(f"   Full profile: {record['profile']}")
+            else:
+                print(f"   Peak traced memory: {record['peak_memory'] / 1e6:.1f} MB")
+                for line in record["top_allocations"]:
+                    print(f"   {line}")
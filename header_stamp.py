@@ -0,0 +1,100 @@
+"""
+Header Stamp
+Sets the SSP header (SSP / revision / Page X of Y) and removes old page,
+issue and revision lines from the footers. Shared by the add header script
+and the release pipeline.
+"""
+
+import re
+from copy import deepcopy
+from xml.sax.saxutils import escape
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+from lxml import etree
+
+# Bold Tahoma 8 pt (w:sz is in half-points)
+HEADER_RPR = '<w:rPr><w:rFonts w:ascii="Tahoma" w:hAnsi="Tahoma"/><w:b/><w:sz w:val="16"/></w:rPr>'
+
+
+def field_xml(field_type):
+    """A Word field like PAGE or NUMPAGES, as the inside of a run."""
+    return (
+        '<w:fldChar w:fldCharType="begin"/>'
+        f'<w:instrText>{field_type}</w:instrText>'
+        '<w:fldChar w:fldCharType="end"/>'
+    )
+
+
+def distinct_parts(doc, kind):
+    """Each header or footer (kind) the document shows, once per part.
+
+    Covers the default, first-page and even-page variants that are switched
+    on. Linked variants belong to an earlier section and are skipped, and a
+    part referenced from several sections is yielded only once. Missing
+    headers of the first section are created.
+    """
+    even_pages = doc.settings.odd_and_even_pages_header_footer
+    seen = set()
+    for index, section in enumerate(doc.sections):
+        variants = [getattr(section, kind)]
+        if section.different_first_page_header_footer:
+            variants.append(getattr(section, f"first_page_{kind}"))
+        if even_pages:
+            variants.append(getattr(section, f"even_page_{kind}"))
+
+        for part in variants:
+            if part.is_linked_to_previous and (index > 0 or kind == "footer"):
+                continue
+            element = part._element  # adds the definition if the first section has none
+            if id(element) in seen:
+                continue
+            seen.add(id(element))
+            yield part
+
+
+class HeaderStamp:
+    """The header compiled once from header_rev, and the footer patterns as one regex.
+
+    The header runs are parsed into XML elements up front and deep-copied
+    into the first paragraph of each header part; every footer paragraph is
+    checked with a single combined, case-insensitive pattern.
+    """
+
+    def __init__(self, header_rev, footer_patterns):
+        runs = [
+            "<w:t>SSP</w:t><w:br/>",
+            f"<w:t>{escape(header_rev)}</w:t><w:br/>",
+            '<w:t xml:space="preserve">Page </w:t>' + field_xml("PAGE"),
+            '<w:t xml:space="preserve"> of </w:t>' + field_xml("NUMPAGES"),
+        ]
+        self.runs = [parse_xml(f'<w:r {nsdecls("w")}>{HEADER_RPR}{run}</w:r>') for run in runs]
+        self.footer_pattern = re.compile("|".join(f"(?:{pattern})" for pattern in footer_patterns),
+                                         re.IGNORECASE)
+
+    def clean_footers(self, doc):
+        """Clear every footer paragraph matching a footer pattern. Returns the removed texts."""
+        removed = []
+        for footer in distinct_parts(doc, "footer"):
+            for paragraph in footer.paragraphs:
+                text = paragraph.text
+                if self.footer_pattern.search(text):
+                    removed.append(text)
+                    paragraph.clear()  # Clear entire paragraph
+        return removed
+
+    def stamp_headers(self, doc):
+        """Replace the first paragraph's content of every header part.
+
+        Returns the number of parts that changed (an already stamped part doesn't count).
+        """
+        count = 0
+        for header in distinct_parts(doc, "header"):
+            before = etree.tostring(header._element)
+            paragraphs = header.paragraphs
+            p = paragraphs[0] if paragraphs else header.add_paragraph()
+            p.clear()
+            p.alignment = 0  # left
+            for run in self.runs:
+                p._p.append(deepcopy(run))
+            count += etree.tostring(header._element) != before
+        return count
@@ -0,0 +1,168 @@
+"""
+Office Convert
+Batch conversion of legacy Office files (.doc, .xls, ...) with LibreOffice.
+Each soffice --convert-to run takes a batch of files, so LibreOffice starts
+once per batch instead of once per file. A few runs go side by side, each
+with its own user profile, so they never block each other.
+"""
+
+import os
+import queue
+import shutil
+import signal
+import subprocess
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# status is "converted", "failed" or "timeout"; output is None unless converted
+ConversionResult = namedtuple("ConversionResult", "source output status detail")
+
+
+def _output_path(source, target_format):
+    """Where soffice --convert-to writes source: same folder, new extension"""
+    return os.path.splitext(source)[0] + "." + target_format
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _run_soffice(command, timeout):
+    """Run one soffice command; on timeout kill it along with the processes it started.
+
+    soffice is only a launcher: the soffice.bin it starts holds the profile
+    lock, so killing the launcher alone would block the profile's next batch.
+    """
+    if os.name == "nt":
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   creationflags=subprocess.CREATE_NEW_PROCESS_GROUP)
+    else:
+        process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                   start_new_session=True)
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+        raise
+
+
+class BatchConverter:
+    """Headless LibreOffice runs converting files to target_format in batches.
+
+    Up to `instances` runs go at once, each with its own profile directory,
+    created on first use and kept (already initialised) for every later
+    batch. Every batch is a new soffice process. Files are grouped into
+    batches per folder; a batch gets timeout seconds per file, and when it
+    runs out the file LibreOffice was stuck on is reported as "timeout" and
+    the rest of the batch is retried.
+    """
+
+    def __init__(self, target_format, instances=2, batch_size=25, timeout=30, soffice="soffice"):
+        self.target_format = target_format
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.soffice = soffice
+        self.instances = max(1, instances)
+        self._profiles = queue.Queue()
+        for _ in range(self.instances):
+            self._profiles.put(tempfile.mkdtemp(prefix="soffice_profile_"))
+
+    def _batches(self, paths):
+        """Batches of files from one folder, with no two sources sharing an output name"""
+        by_folder = {}
+        for path in paths:
+            by_folder.setdefault(os.path.dirname(os.path.abspath(path)), []).append(path)
+
+        for folder, folder_paths in by_folder.items():
+            batch, outputs = [], set()
+            for path in folder_paths:
+                output = os.path.normcase(_output_path(path, self.target_format))
+                if len(batch) >= self.batch_size or output in outputs:
+                    yield folder, batch
+                    batch, outputs = [], set()
+                batch.append(path)
+                outputs.add(output)
+            if batch:
+                yield folder, batch
+
+    def _run_batch(self, folder, batch):
+        """Convert one batch with whichever profile is free"""
+        profile = self._profiles.get()
+        try:
+            results = {}
+            remaining = list(batch)
+            solo = False
+            while remaining:
+                # After a timeout the next file runs on its own, to tell a hang from a failure
+                chunk = remaining[:1] if solo else remaining
+                before = {path: _mtime(_output_path(path, self.target_format)) for path in chunk}
+                command = [
+                    self.soffice, f"-env:UserInstallation={Path(profile).as_uri()}",
+                    "--headless", "--convert-to", self.target_format, "--outdir", folder,
+                ] + chunk
+                try:
+                    _run_soffice(command, self.timeout * len(chunk))
+                    timed_out = False
+                except subprocess.TimeoutExpired:
+                    timed_out = True
+                except OSError as e:  # soffice not installed / not on PATH
+                    for path in remaining:
+                        results[path] = ConversionResult(path, None, "failed", str(e))
+                    break
+
+                written = [
+                    _mtime(_output_path(path, self.target_format)) not in (None, before[path])
+                    for path in chunk
+                ]
+                # Files are converted in argument order, so after a timeout every
+                # file up to the last written output is settled and the rest is retried
+                done = len(chunk)
+                if timed_out:
+                    done = max((i + 1 for i, ok in enumerate(written) if ok), default=0)
+                    if len(chunk) == 1:
+                        results[chunk[0]] = ConversionResult(
+                            chunk[0], None, "timeout", f"no result after {self.timeout}s")
+                        done = 1
+
+                for path, ok in zip(chunk[:done], written):
+                    if ok:
+                        results[path] = ConversionResult(
+                            path, _output_path(path, self.target_format), "converted", "")
+                    elif path not in results:
+                        results[path] = ConversionResult(path, None, "failed", "LibreOffice wrote no output")
+                remaining = remaining[done:]
+                solo = timed_out and len(chunk) > 1
+            return results
+        finally:
+            self._profiles.put(profile)
+
+    def convert(self, paths):
+        """Convert every path. Returns a ConversionResult per path, in input order."""
+        paths = list(paths)
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.instances) as pool:
+            futures = [pool.submit(self._run_batch, folder, batch)
+                       for folder, batch in self._batches(paths)]
+            for future in futures:
+                results.update(future.result())
+        return [results[path] for path in paths]
+
+    def close(self):
+        """Delete the profiles"""
+        while not self._profiles.empty():
+            shutil.rmtree(self._profiles.get(), ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,179 @@
+"""
+OOXML Package
+Rewrites a .docx/.xlsx ZIP package when only a few of its parts change:
+changed and new parts are compressed, every other entry's compressed bytes
+are copied straight from the source archive.
+
+Also saves python-docx documents and openpyxl workbooks this way: the
+library serializes its parts (without compressing them), and only parts
+whose bytes differ from the source file are deflated again. Images, fonts
+and embedded objects are copied as they are.
+"""
+
+import copy
+import datetime
+import os
+import struct
+import zipfile
+import zlib
+from io import BytesIO
+
+
+def copy_entry_raw(zin, zout, info):
+    """Copy a ZIP entry's compressed bytes as-is, without inflating or deflating it."""
+    # Skip the local file header to reach the compressed data
+    zin.fp.seek(info.header_offset)
+    local_header = zin.fp.read(zipfile.sizeFileHeader)
+    name_len, extra_len = struct.unpack("<HH", local_header[26:30])
+    zin.fp.seek(info.header_offset + zipfile.sizeFileHeader + name_len + extra_len)
+    data = zin.fp.read(info.compress_size)
+
+    out_info = copy.copy(info)
+    out_info.flag_bits &= ~0x08  # CRC and sizes are known, so no data descriptor
+    out_info.header_offset = zout.fp.tell()
+    zout.fp.write(out_info.FileHeader())
+    zout.fp.write(data)
+
+    # Register the entry so it lands in the central directory on close
+    zout.filelist.append(out_info)
+    zout.NameToInfo[out_info.filename] = out_info
+    zout.start_dir = zout.fp.tell()
+    zout._didModify = True
+
+
+def write_part(zout, info, data):
+    """Deflate data into zout under the name and timestamp of info (a ZipInfo of the source)."""
+    out_info = copy.copy(info)
+    out_info.flag_bits &= ~0x08
+    out_info.compress_type = zipfile.ZIP_DEFLATED
+    zout.writestr(out_info, data)
+
+
+def rewrite_package(zin, output_file, replaced_parts):
+    """Write a copy of the package, re-encoding only the parts in replaced_parts.
+
+    Names in replaced_parts that are not in the package are added at the end.
+    """
+    with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            if info.filename in replaced_parts:
+                write_part(zout, info, replaced_parts[info.filename])
+            else:
+                copy_entry_raw(zin, zout, info)
+
+        for name, data in replaced_parts.items():
+            if name not in zin.NameToInfo:
+                zout.writestr(name, data)
+
+
+def same_bytes(info, data):
+    """True if data is exactly the content of the entry described by info (size and CRC-32)."""
+    return info.file_size == len(data) and info.CRC == zlib.crc32(data)
+
+
+def pack_entries(zin, entries, output_file, unchanged=None):
+    """Write entries as a package to output_file (a path or file object).
+
+    Entries whose bytes are identical to the same entry of zin are copied
+    still compressed; the others are deflated. unchanged is the set of those
+    names, if the caller already worked it out.
+    """
+    if unchanged is None:
+        unchanged = {name for name, data in entries
+                     if name in zin.NameToInfo and same_bytes(zin.NameToInfo[name], data)}
+    with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED, allowZip64=True) as zout:
+        for name, data in entries:
+            if name in unchanged:
+                copy_entry_raw(zin, zout, zin.NameToInfo[name])
+            elif name in zin.NameToInfo:
+                write_part(zout, zin.NameToInfo[name], data)
+            else:
+                zout.writestr(name, data)
+
+
+def write_entries(source_path, entries, output_path):
+    """Write a package from its serialized entries, reusing the source file where possible.
+
+    entries: (name, bytes) pairs in the order they should be stored, as
+    produced by docx_entries() or xlsx_entries(). Entries whose bytes are
+    identical to the same entry of source_path are copied still compressed;
+    the others are deflated. When output_path is source_path and nothing
+    differs, the file is left alone. Returns True if a file was written.
+    """
+    in_place = os.path.normcase(os.path.abspath(output_path)) == os.path.normcase(os.path.abspath(source_path))
+    temp_path = os.fspath(output_path) + ".tmp"
+    try:
+        with zipfile.ZipFile(source_path, 'r') as zin:
+            unchanged = {name for name, data in entries
+                         if name in zin.NameToInfo and same_bytes(zin.NameToInfo[name], data)}
+            if in_place and len(unchanged) == len(entries) == len(zin.infolist()):
+                return False
+            pack_entries(zin, entries, temp_path, unchanged)
+
+        os.replace(temp_path, output_path)
+        return True
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def entries_to_bytes(source_data, entries):
+    """Like write_entries(), but from and to memory: the new package's bytes, or None if nothing differs."""
+    with zipfile.ZipFile(BytesIO(source_data), 'r') as zin:
+        unchanged = {name for name, data in entries
+                     if name in zin.NameToInfo and same_bytes(zin.NameToInfo[name], data)}
+        if len(unchanged) == len(entries) == len(zin.infolist()):
+            return None
+        output = BytesIO()
+        pack_entries(zin, entries, output, unchanged)
+    return output.getvalue()
+
+
+class _EntryCollector:
+    """Stands in for python-docx's zip writer and keeps the serialized entries instead."""
+
+    def __init__(self):
+        self.entries = []
+
+    def write(self, pack_uri, blob):
+        self.entries.append((pack_uri.membername, blob))
+
+
+def docx_entries(doc):
+    """Serialize a python-docx Document to (name, bytes) pairs, the way doc.save() would."""
+    from docx.opc.pkgwriter import PackageWriter
+
+    package = doc.part.package
+    parts = list(package.parts)
+    for part in parts:
+        part.before_marshal()
+    collector = _EntryCollector()
+    PackageWriter._write_content_types_stream(collector, parts)
+    PackageWriter._write_pkg_rels(collector, package.rels)
+    PackageWriter._write_parts(collector, parts)
+    return collector.entries
+
+
+def xlsx_entries(wb):
+    """Serialize an openpyxl Workbook to (name, bytes) pairs, the way wb.save() would.
+
+    openpyxl writes into an uncompressed in-memory archive, which is then
+    read back; nothing is deflated at this point.
+    """
+    from openpyxl.writer.excel import ExcelWriter
+
+    buffer = BytesIO()
+    wb.properties.modified = datetime.datetime.now(tz=datetime.timezone.utc).replace(tzinfo=None)
+    ExcelWriter(wb, zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED, allowZip64=True)).save()
+    with zipfile.ZipFile(buffer, 'r') as archive:
+        return [(info.filename, archive.read(info)) for info in archive.infolist()]
+
+
+def save_docx(doc, source_path, output_path=None):
+    """doc.save() that only re-compresses changed parts. Returns True if a file was written."""
+    return write_entries(source_path, docx_entries(doc), output_path or source_path)
+
+
+def save_xlsx(wb, source_path, output_path=None):
+    """wb.save() that only re-compresses changed parts. Returns True if a file was written."""
+    return write_entries(source_path, xlsx_entries(wb), output_path or source_path)
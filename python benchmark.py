@@ -0,0 +1,205 @@
+"""
+Benchmark
+Runs each script's hot path on a synthetic corpus (benchmark_corpus.py) and
+reports files/s, MB/s and peak RSS next to the stored baseline, so a change
+that makes a script slower shows up before it reaches the real forms.
+
+Every run works on a fresh copy of the corpus, in its own Python process,
+with the script's settings overridden (single worker, no manifest).
+"""
+
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# SETTINGS – edit these before running
+corpus_folder = os.path.join(tempfile.gettempdir(), "docx_tools_benchmark")  # Generated once, reused
+scale = "default"  # "small", "default" or "large" (sizes in benchmark_corpus.SCALES)
+hit_density = 0.05  # Share of paragraphs/cells/blocks containing a term
+seed = 1
+repeat = 3  # Runs per benchmark; the fastest counts
+only = []  # Names of benchmarks to run (empty = all)
+baseline_file = "benchmark_baseline.json"  # Next to this script
+save_baseline = False  # Store this run as the new baseline (done automatically if none exists)
+tolerance = 0.10  # Flag benchmarks more than 10% slower than the baseline
+
+# --- Do not edit below this line ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+HIT_TERM = "VEM FORMS REMOVED FOR MANUAL REVISION"  # Same as benchmark_corpus.HIT_TERM
+XLSX_HIT_TERM = "Belships"  # Same as benchmark_corpus.XLSX_HIT_TERM
+
+FORMAT_SOURCE = '''
+import glob, importlib.util, os
+spec = importlib.util.spec_from_file_location("formatter", {script!r})
+formatter_module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(formatter_module)
+paths = sorted(glob.glob(os.path.join({work!r}, "*.docx")))
+formatter = formatter_module.DocxFormatter(paths[0])
+os.makedirs({out!r}, exist_ok=True)
+for path in paths:
+    formatter.format_document(path, os.path.join({out!r}, os.path.basename(path)))
+'''
+
+def script_source(script, **settings):
+    """Source of a script with some of its top-level (single-line) settings replaced."""
+    with open(os.path.join(SCRIPT_DIR, script), encoding="utf-8") as f:
+        source = f.read()
+    for name, value in settings.items():
+        source, count = re.subn(rf"^{name} = .*$", f"{name} = {value!r}".replace("\\", "\\\\"),
+                                source, count=1, flags=re.M)
+        if not count:
+            raise ValueError(f"'{script}' has no setting '{name}'")
+    return source
+
+# name: (corpus kind, function of (work folder, output folder) returning the source to run)
+BENCHMARKS = {
+    "replace_docx": ("docx", lambda work, out: script_source(
+        "python replace_all_docx_recursive.py", root_folder=work, find_text=HIT_TERM,
+        workers=1, prefilter=False, use_manifest=False, use_index=False)),
+    "format_docx": ("docx", lambda work, out: FORMAT_SOURCE.format(
+        script=os.path.join(SCRIPT_DIR, "python fomatter_all_docx_recursive.py"), work=work, out=out)),
+    "remove_lock": ("docx", lambda work, out: script_source(
+        "python remove lock docx.py", input_folder=work, output_folder=out, use_manifest=False)),
+    "replace_xlsx_cells": ("xlsx", lambda work, out: script_source(
+        "python replace_all_xlsx_recursive.py", root_folder=work, find_text=XLSX_HIT_TERM,
+        shared_strings_mode=False, use_manifest=False, use_index=False)),
+    "replace_xlsx_shared_strings": ("xlsx", lambda work, out: script_source(
+        "python replace_all_xlsx_recursive.py", root_folder=work, find_text=XLSX_HIT_TERM,
+        shared_strings_mode=True, use_manifest=False, use_index=False)),
+    "pdf_redaction": ("pdf", lambda work, out: script_source(
+        "python pdf_redaction.py", input_folder=work, output_folder=out,
+        log_file=os.path.join(out, "Batch_Redaction_Log.txt"), page_workers=1)),
+}
+
+def python_env():
+    """Environment for child processes, with the shared modules importable."""
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [SCRIPT_DIR, env.get("PYTHONPATH")]))
+    return env
+
+def ensure_corpus():
+    """Generate the corpus unless one with the same parameters is already there.
+
+    Generation runs in a child process: on Linux a child's peak RSS starts at
+    its parent's, so this process keeps docx/openpyxl/fitz out of its memory.
+    """
+    params = {"scale": scale, "hit_density": hit_density, "seed": seed}
+    params_path = os.path.join(corpus_folder, "corpus.json")
+    if os.path.exists(params_path):
+        with open(params_path, encoding="utf-8") as f:
+            if json.load(f) == params:
+                return
+    shutil.rmtree(corpus_folder, ignore_errors=True)
+    print(f"Generating {scale} corpus in {corpus_folder}...")
+    subprocess.run([sys.executable, "-c",
+                    "import sys, benchmark_corpus; benchmark_corpus.generate_corpus("
+                    "sys.argv[1], sys.argv[2], float(sys.argv[3]), int(sys.argv[4]))",
+                    corpus_folder, scale, str(hit_density), str(seed)],
+                   env=python_env(), check=True)
+    with open(params_path, "w", encoding="utf-8") as f:
+        json.dump(params, f, indent=2)
+
+def run_once(name, kind):
+    """Run one benchmark on a fresh corpus copy. Returns (seconds, peak RSS in bytes or None)."""
+    run_root = tempfile.mkdtemp(prefix=f"bench_{name}_")
+    try:
+        work = os.path.join(run_root, kind)
+        out = os.path.join(run_root, "out")
+        shutil.copytree(os.path.join(corpus_folder, kind), work)
+        script_path = os.path.join(run_root, "bench_script.py")
+        with open(script_path, "w", encoding="utf-8") as f:
+            f.write(BENCHMARKS[name][1](work, out))
+
+        with open(os.path.join(run_root, "stderr.txt"), "w+", encoding="utf-8", errors="replace") as err:
+            start = time.perf_counter()
+            proc = subprocess.Popen([sys.executable, script_path], cwd=run_root, env=python_env(),
+                                    stdout=subprocess.DEVNULL, stderr=err)
+            if hasattr(os, "wait4"):
+                # wait4 gives the child's own resource usage, including its peak RSS
+                _, status, usage = os.wait4(proc.pid, 0)
+                seconds = time.perf_counter() - start
+                returncode = os.waitstatus_to_exitcode(status)
+                peak = usage.ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+            else:
+                returncode = proc.wait()
+                seconds = time.perf_counter() - start
+                peak = None
+            err.seek(0)
+            if returncode != 0:
+                raise RuntimeError(f"{name} failed:\n{err.read()[-2000:]}")
+        return seconds, peak
+    finally:
+        shutil.rmtree(run_root, ignore_errors=True)
+
+def run_benchmark(name):
+    kind = BENCHMARKS[name][0]
+    folder = os.path.join(corpus_folder, kind)
+    files = [os.path.join(folder, f) for f in os.listdir(folder)]
+    total_bytes = sum(os.path.getsize(f) for f in files)
+
+    runs = [run_once(name, kind) for _ in range(repeat)]
+    seconds = min(run[0] for run in runs)
+    peaks = [run[1] for run in runs if run[1] is not None]
+    return {
+        "files": len(files),
+        "bytes": total_bytes,
+        "seconds": round(seconds, 4),
+        "files_per_s": round(len(files) / seconds, 2),
+        "mb_per_s": round(total_bytes / seconds / 1e6, 3),
+        "peak_rss_mb": round(max(peaks) / 1e6, 1) if peaks else None,
+    }
+
+def main():
+    ensure_corpus()
+
+    baseline_path = os.path.join(SCRIPT_DIR, baseline_file)
+    baseline = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+    if baseline.get("corpus") not in (None, {"scale": scale, "hit_density": hit_density, "seed": seed}):
+        print("⚠️ Baseline was recorded on a different corpus; comparisons are not meaningful.")
+
+    names = only or list(BENCHMARKS)
+    results = {}
+    regressions = []
+    print(f"\n{'benchmark':<30}{'files/s':>10}{'MB/s':>10}{'peak RSS':>12}{'vs baseline':>14}")
+    for name in names:
+        result = results[name] = run_benchmark(name)
+        rss = f"{result['peak_rss_mb']} MB" if result["peak_rss_mb"] is not None else "n/a"
+        change = ""
+        old = baseline.get("results", {}).get(name)
+        if old:
+            ratio = old["seconds"] / result["seconds"] - 1  # > 0: faster than baseline
+            change = f"{ratio:+.0%}"
+            # Judge on run time, so tolerance means what the setting says (10% = 1.1x the baseline time)
+            if result["seconds"] > old["seconds"] * (1 + tolerance):
+                change += " ⚠️"
+                regressions.append(name)
+        print(f"{name:<30}{result['files_per_s']:>10}{result['mb_per_s']:>10}{rss:>12}{change:>14}")
+
+    if save_baseline or not baseline:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "recorded": datetime.now().isoformat(timespec="seconds"),
+                "python": sys.version.split()[0],
+                "platform": platform.platform(),
+                "corpus": {"scale": scale, "hit_density": hit_density, "seed": seed},
+                "results": {**baseline.get("results", {}), **results},
+            }, f, indent=2)
+        print(f"\n📄 Baseline saved to: {baseline_path}")
+
+    if regressions:
+        print(f"\n⚠️ Slower than baseline by more than {tolerance:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+    print("\nDone!")
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,47 @@
 import os
-from openpyxl import load_workbook
-from openpyxl.packaging.core import DocumentProperties
+from batch_manifest import Manifest
+from core_properties import update_author
+from file_discovery import iter_files
 
 # === SETTINGS ===
 root_folder = r"C:\Users\judep\Downloads\FORMS EDITING\1. Accounting Forms"  # 🔹 Folder with Excel files
 new_author = "LMMS"  # 🔹 New author name
+new_company = None  # 🔹 Also set Company in docProps/app.xml (None = leave app.xml untouched)
+use_manifest = True  # 🔹 Skip files unchanged since their last successful run
 
 # === SCRIPT ===
 count = 0
-for root, _, files in os.walk(root_folder):
-    for file in files:
-        if file.lower().endswith(".xlsx"):
-            path = os.path.join(root, file)
-            try:
-                wb = load_workbook(path)
-                props = wb.properties
+already_set = 0
+skipped = 0
+manifest = None
+if use_manifest:
+    manifest = Manifest(root_folder, "change_author", {"new_author": new_author, "new_company": new_company})
 
-                # Optional: Print old author before changing
-                print(f"📄 {file} — Old author: {props.creator or 'None'}")
+for path in iter_files(root_folder, (".xlsx", ".xlsm")):
+    file = os.path.basename(path)
+    if manifest and manifest.is_done(path):
+        skipped += 1
+        continue
+    try:
+        old_author, rewritten = update_author(path, new_author, new_company)
 
-                # Update author fields
-                props.creator = new_author
-                props.lastModifiedBy = new_author
-                wb.properties = props
+        if rewritten:
+            # Optional: Print old author before changing
+            print(f"📄 {file} — Old author: {old_author or 'None'}")
 
-                wb.save(path)
-                wb.close()
-                count += 1
-                print(f"✅ Updated author in: {file}")
-            except Exception as e:
-                print(f"⚠️ Could not update {file}: {e}")
+            count += 1
+            print(f"✅ Updated author in: {file}")
+        else:
+            already_set += 1
+            print(f"— Author already set: {file}")
+        if manifest:
+            manifest.record(path)
+    except Exception as e:
+        print(f"⚠️ Could not update {file}: {e}")
+
+if manifest:
+    manifest.close()
 
 print(f"\nDone! Updated author in {count} Excel files.")
+print(f"— Not rewritten (author already set): {already_set} files.")
+print(f"⏭️ Skipped {skipped} files unchanged since the last run.")
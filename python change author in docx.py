@@ -1,25 +1,43 @@
 import os
-from docx import Document
+from batch_manifest import Manifest
+from core_properties import update_author
+from file_discovery import iter_files
 
 # === SETTINGS ===
 root_folder = r"C:\Users\judep\Downloads\SMS FOR EDITING_VER 1"  # 🔹 Change to your folder path
 new_author = "LMMS"  # 🔹 The author name you want to apply
+new_company = None  # 🔹 Also set Company in docProps/app.xml (None = leave app.xml untouched)
+use_manifest = True  # 🔹 Skip files unchanged since their last successful run
 
 # === SCRIPT ===
 count = 0
-for root, _, files in os.walk(root_folder):
-    for file in files:
-        if file.lower().endswith(".docx"):
-            path = os.path.join(root, file)
-            try:
-                doc = Document(path)
-                core_props = doc.core_properties
-                core_props.author = new_author
-                core_props.last_modified_by = new_author
-                doc.save(path)
-                count += 1
-                print(f"✅ Updated author in: {file}")
-            except Exception as e:
-                print(f"⚠️ Could not update {file}: {e}")
+already_set = 0
+skipped = 0
+manifest = None
+if use_manifest:
+    manifest = Manifest(root_folder, "change_author", {"new_author": new_author, "new_company": new_company})
+
+for path in iter_files(root_folder, (".docx",)):
+    file = os.path.basename(path)
+    if manifest and manifest.is_done(path):
+        skipped += 1
+        continue
+    try:
+        old_author, rewritten = update_author(path, new_author, new_company)
+        if rewritten:
+            count += 1
+            print(f"✅ Updated author in: {file}")
+        else:
+            already_set += 1
+            print(f"— Author already set: {file}")
+        if manifest:
+            manifest.record(path)
+    except Exception as e:
+        print(f"⚠️ Could not update {file}: {e}")
+
+if manifest:
+    manifest.close()
 
 print(f"\nDone! Updated author in {count} files.")
+print(f"— Not rewritten (author already set): {already_set} files.")
+print(f"⏭️ Skipped {skipped} files unchanged since the last run.")
@@ -1,30 +1,35 @@
-import os
 import time
 from datetime import datetime
+from date_normalize import normalize_all
+from file_discovery import iter_files
 
 # --- SETTINGS ---
 root_folder = r"C:\Users\judep\Downloads\SMS FOR EDITING_VER 1"   # Change this
 new_edit_date = "2025-10-22"              # Date only (YYYY-MM-DD)
+extensions = (".docx",)  # File types to update
+core_dates = True  # Also set created/modified inside docProps/core.xml (what Office shows under Info)
+io_workers = 16  # Files updated at once (threads; mostly waiting on the disk or network share)
 
 # Convert date to timestamp
 edit_timestamp = time.mktime(datetime.strptime(new_edit_date, "%Y-%m-%d").timetuple())
 
 changed_files = []
+rewritten = 0
 
-for root, dirs, files in os.walk(root_folder):
-    for file in files:
-        # Only process real .docx files
-        if file.lower().endswith(".docx"):
-            full_path = os.path.join(root, file)
-            try:
-                os.utime(full_path, (edit_timestamp, edit_timestamp))
-                changed_files.append(full_path)
-                print("Updated date:", full_path)
-            except Exception as e:
-                print("Failed to update:", full_path, "| Error:", e)
+for full_path, package_rewritten, error in normalize_all(iter_files(root_folder, extensions), edit_timestamp,
+                                                         core_dates, io_workers):
+    if error is not None:
+        print("Failed to update:", full_path, "| Error:", error)
+        continue
+    changed_files.append(full_path)
+    rewritten += package_rewritten
+    print("Updated date:", full_path)
 
 print("\n=== DATE CHANGE COMPLETE ===")
-print(f"Total .docx files updated: {len(changed_files)}\n")
+print(f"Total .docx files updated: {len(changed_files)}")
+if core_dates:
+    print(f"Document properties rewritten in: {rewritten} (the rest already had this date)")
+print()
 
 for f in changed_files:
     print(" -", f)
@@ -1,8 +1,15 @@
+import copy
 import os
+import posixpath
+import re
 import shutil
-import time
-import win32com.client as win32
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from xml.sax.saxutils import quoteattr
+from lxml import etree
+from file_discovery import iter_files
+from ooxml_package import rewrite_package
 
 # Configuration for watermark appearance
 WATERMARK_TEXT = "CONFIDENTIAL"   # Text in watermark
@@ -12,63 +19,270 @@ WATERMARK_COLOR = 12632256        # Gray color RGB (light gray)
 WATERMARK_ROTATION = -45          # Rotate watermark diagonally
 WATERMARK_TRANSPARENCY = 0.8      # Transparency (0.0 opaque - 1.0 fully transparent)
 
+MAKE_BACKUP = True                # Copy each file to .backup.docx before watermarking
+WORKERS = os.cpu_count() or 1     # Number of worker processes (1 = process files one by one)
+
 
 # Starting directory (change to your folder)
 START_DIR = r"C:\Users\judep\Downloads\FORMS EDITING\UNLOCKED"
 
+# --- Package parts and namespaces ---
+DOCUMENT_PART = "word/document.xml"
+DOCUMENT_RELS_PART = "word/_rels/document.xml.rels"
+SETTINGS_PART = "word/settings.xml"
+CONTENT_TYPES_PART = "[Content_Types].xml"
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+V_NS = "urn:schemas-microsoft-com:vml"
+O_NS = "urn:schemas-microsoft-com:office:office"
+W10_NS = "urn:schemas-microsoft-com:office:word"
+
+HEADER_REL_TYPE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/header"
+HEADER_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml"
+
+# Same shape id prefix Word gives its own watermarks, so Word's Design > Watermark can edit/remove it
+WATERMARK_ID = "PowerPlusWaterMarkObject"
+
+# A section's properties, including a tracked previous version (<w:sectPrChange>), which holds a <w:sectPr> of its own
+SECT_PR_CHANGE_RE = re.compile(r"<w:sectPrChange\b.*?</w:sectPrChange>", re.S)
+SECT_PR_RE = re.compile(r"<w:sectPr\b[^>]*?(?:/>|>(?:<w:sectPrChange\b.*?</w:sectPrChange>|.)*?</w:sectPr>)", re.S)
+HEADER_REF_RE = re.compile(r"<w:headerReference\b[^>]*\bw:type=\"(\w+)\"")
+# <w:titlePg/> or <w:evenAndOddHeaders/>, unless switched off with w:val="0"/"false"
+TITLE_PG_RE = re.compile(r"<w:titlePg\b(?![^>]*w:val=\"(?:0|false|off)\")")
+EVEN_ODD_RE = re.compile(r"<w:evenAndOddHeaders\b(?![^>]*w:val=\"(?:0|false|off)\")")
+RELATIONSHIP_RE = re.compile(r"<Relationship\b[^>]*>")
+ATTR_RE = re.compile(r"(\w+)=\"([^\"]*)\"")
+
+
+def build_watermark_run():
+    """The watermark as a <w:r> with a VML WordArt shape, built once from the WATERMARK_* settings.
+
+    This is the markup Word itself writes for Design > Watermark: a text path
+    shape centred on the page margins, behind the text.
+    """
+    # Word COM colors are 0xBBGGRR; VML wants #RRGGBB
+    red, green, blue = WATERMARK_COLOR & 0xFF, (WATERMARK_COLOR >> 8) & 0xFF, (WATERMARK_COLOR >> 16) & 0xFF
+    color = f"#{red:02x}{green:02x}{blue:02x}"
+    opacity = round(1 - WATERMARK_TRANSPARENCY, 3)
+    rotation = WATERMARK_ROTATION % 360
+    # Approximate the text box from the font size (average glyph ~0.6 em)
+    width = round(WATERMARK_SIZE * 0.6 * max(len(WATERMARK_TEXT), 1), 1)
+    height = WATERMARK_SIZE
+
+    style = (
+        f"position:absolute;margin-left:0;margin-top:0;width:{width}pt;height:{height}pt;"
+        f"rotation:{rotation};z-index:-251657216;"
+        "mso-position-horizontal:center;mso-position-horizontal-relative:margin;"
+        "mso-position-vertical:center;mso-position-vertical-relative:margin"
+    )
+    text_style = f'font-family:"{WATERMARK_FONT}";font-size:{WATERMARK_SIZE}pt'
+
+    xml = f"""<w:r xmlns:w="{W_NS}" xmlns:v="{V_NS}" xmlns:o="{O_NS}" xmlns:w10="{W10_NS}">
+  <w:rPr><w:noProof/></w:rPr>
+  <w:pict>
+    <v:shapetype id="_x0000_t136" coordsize="21600,21600" o:spt="136" adj="10800" path="m@7,l@8,m@5,21600l@6,21600e">
+      <v:formulas>
+        <v:f eqn="sum #0 0 10800"/><v:f eqn="prod #0 2 1"/><v:f eqn="sum 21600 0 @1"/>
+        <v:f eqn="sum 0 0 @2"/><v:f eqn="sum 21600 0 @3"/><v:f eqn="if @0 @3 0"/>
+        <v:f eqn="if @0 21600 @1"/><v:f eqn="if @0 0 @2"/><v:f eqn="if @0 @4 21600"/>
+        <v:f eqn="mid @5 @6"/><v:f eqn="mid @8 @5"/><v:f eqn="mid @7 @8"/>
+        <v:f eqn="mid @6 @7"/><v:f eqn="sum @6 0 @5"/>
+      </v:formulas>
+      <v:path textpathok="t" o:connecttype="custom" o:connectlocs="@9,0;@10,10800;@11,21600;@12,10800" o:connectangles="270,180,90,0"/>
+      <v:textpath on="t" fitshape="t"/>
+      <v:handles><v:h position="#0,bottomRight" xrange="6629,14971"/></v:handles>
+      <o:lock v:ext="edit" text="t" shapetype="t"/>
+    </v:shapetype>
+    <v:shape id="{WATERMARK_ID}" o:spid="_x0000_s2049" type="#_x0000_t136" style={quoteattr(style)} o:allowincell="f" fillcolor="{color}" stroked="f">
+      <v:fill opacity="{opacity}"/>
+      <v:textpath style={quoteattr(text_style)} string={quoteattr(WATERMARK_TEXT)}/>
+      <w10:wrap anchorx="margin" anchory="margin"/>
+    </v:shape>
+  </w:pict>
+</w:r>"""
+    return etree.fromstring(xml, etree.XMLParser(remove_blank_text=True))
+
+
+WATERMARK_RUN = build_watermark_run()
+
+EMPTY_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    f'<w:hdr xmlns:w="{W_NS}" xmlns:r="{R_NS}"><w:p/></w:hdr>'
+).encode("utf-8")
+
+
+def watermark_header(xml, index):
+    """Return header part xml with the watermark in its first paragraph.
+
+    A watermark added earlier (by this script or by Word) is replaced, so
+    re-running with new settings doesn't stack shapes.
+    """
+    root = etree.fromstring(xml)
+
+    old_runs = []
+    for shape in root.iter(f"{{{V_NS}}}shape"):
+        if shape.get("id", "").startswith(WATERMARK_ID):
+            run = next(shape.iterancestors(f"{{{W_NS}}}r"), None)
+            if run is not None:
+                old_runs.append(run)
+    for run in old_runs:
+        run.getparent().remove(run)
+
+    paragraph = root.find(f"{{{W_NS}}}p")
+    if paragraph is None:
+        paragraph = etree.SubElement(root, f"{{{W_NS}}}p")
+
+    run = copy.deepcopy(WATERMARK_RUN)
+    shape = run.find(f".//{{{V_NS}}}shape")
+    shape.set("id", f"{WATERMARK_ID}{index}")
+    shape.set(f"{{{O_NS}}}spid", f"_x0000_s{2049 + index}")
+    paragraph.append(run)
+
+    return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+
+def resolve_target(target):
+    """Package part name of a relationship target in word/_rels/document.xml.rels"""
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join("word", target))
+
+
+def add_missing_headers(zin, document_xml, rels_xml, content_types_xml):
+    """Give every section the header types it displays (default, plus first/even when enabled).
+
+    A section without a header reference inherits the previous section's, so a
+    new empty header part is only created where nothing would be inherited.
+    Returns the updated (document_xml, rels_xml, content_types_xml, new_parts).
+    """
+    even_odd = False
+    if SETTINGS_PART in zin.NameToInfo:
+        even_odd = bool(EVEN_ODD_RE.search(zin.read(SETTINGS_PART).decode("utf-8")))
+
+    rel_ids = {dict(ATTR_RE.findall(tag)).get("Id") for tag in RELATIONSHIP_RE.findall(rels_xml)}
+    new_parts = {}
+    new_rels = []
+    defined = set()
+
+    def next_header_name():
+        n = 1
+        while f"word/header{n}.xml" in zin.NameToInfo or f"word/header{n}.xml" in new_parts:
+            n += 1
+        return f"word/header{n}.xml"
+
+    def next_rel_id():
+        n = len(rel_ids) + 1
+        while f"rId{n}" in rel_ids:
+            n += 1
+        rel_ids.add(f"rId{n}")
+        return f"rId{n}"
+
+    def fix_section(match):
+        sect_pr = match.group(0)
+        current = SECT_PR_CHANGE_RE.sub("", sect_pr)  # The old revision's settings don't apply
+        present = set(HEADER_REF_RE.findall(current))
+        needed = {"default"}
+        if TITLE_PG_RE.search(current):
+            needed.add("first")
+        if even_odd:
+            needed.add("even")
+
+        references = []
+        for header_type in ("default", "first", "even"):
+            if header_type in needed and header_type not in present and header_type not in defined:
+                name = next_header_name()
+                rel_id = next_rel_id()
+                new_parts[name] = EMPTY_HEADER
+                new_rels.append((rel_id, name))
+                references.append(f'<w:headerReference w:type="{header_type}" r:id="{rel_id}"/>')
+        defined.update(present | needed)
+
+        if not references:
+            return sect_pr
+        # Header/footer references come first in <w:sectPr>
+        if sect_pr.endswith("/>"):
+            return sect_pr[:-2] + ">" + "".join(references) + "</w:sectPr>"
+        open_end = sect_pr.index(">") + 1
+        return sect_pr[:open_end] + "".join(references) + sect_pr[open_end:]
+
+    document_xml = SECT_PR_RE.sub(fix_section, document_xml)
+
+    if new_rels:
+        if 'xmlns:r="' not in document_xml[:document_xml.index(">", document_xml.index("<w:document"))]:
+            document_xml = document_xml.replace("<w:document", f'<w:document xmlns:r="{R_NS}"', 1)
+        rels_xml = rels_xml.replace("</Relationships>", "".join(
+            f'<Relationship Id="{rel_id}" Type="{HEADER_REL_TYPE}" Target="{posixpath.basename(name)}"/>'
+            for rel_id, name in new_rels) + "</Relationships>")
+        content_types_xml = content_types_xml.replace("</Types>", "".join(
+            f'<Override PartName="/{name}" ContentType="{HEADER_CONTENT_TYPE}"/>'
+            for name in new_parts) + "</Types>")
+
+    return document_xml, rels_xml, content_types_xml, new_parts
+
+
 def add_watermark_to_doc(doc_path):
-    """Add a CONFIDENTIAL-style diagonal watermark to a DOCX file."""
+    """Add the diagonal watermark to every header part (default, first and even) of a DOCX file.
+
+    Works on the package XML directly; only the header parts (and, if headers
+    had to be created, document.xml and its relationships) are rewritten.
+    Returns a status line.
+    """
+    temp_path = doc_path + ".tmp"
     try:
-        word = win32.Dispatch("Word.Application")
-        word.Visible = False
-
-        doc = word.Documents.Open(doc_path)
-
-        # Add watermark text effect as a shape
-        shape = doc.Shapes.AddTextEffect(
-            PresetTextEffect=1,  # msoTextEffect1 basic style
-            Text=WATERMARK_TEXT,
-            FontName=WATERMARK_FONT,
-            FontSize=WATERMARK_SIZE,
-            FontBold=False,
-            FontItalic=False,
-            Left=0,
-            Top=0
-        )
-
-        # Set position relative to page
-        shape.RelativeHorizontalPosition = 1  # wdRelativeHorizontalPositionPage
-        shape.RelativeVerticalPosition = 1    # wdRelativeVerticalPositionPage
-        
-        # Center the watermark on the page
-        shape.Left = -914400 / 2  # Center horizontally (in EMUs: -0.5 inches in points)
-        shape.Top = -914400 / 2   # Center vertically
-        
-        # Alternative: Use LockAnchor and calculate based on page dimensions
-        page_width = doc.PageSetup.PageWidth
-        page_height = doc.PageSetup.PageHeight
-        
-        shape.Left = page_width / 2
-        shape.Top = page_height / 2
-
-        # Set style to appear behind text and transparency
-        shape.Fill.ForeColor.RGB = WATERMARK_COLOR
-        shape.Fill.Transparency = WATERMARK_TRANSPARENCY
-        shape.Line.Transparency = WATERMARK_TRANSPARENCY
-        shape.TextEffect.FontName = WATERMARK_FONT
-        shape.TextEffect.FontSize = WATERMARK_SIZE
-        shape.Rotation = WATERMARK_ROTATION
-        shape.WrapFormat.Type = 3  # wdWrapBehind
-        shape.LockAnchor = True
-        shape.ZOrder(5)  # msoSendBehindText
-
-        doc.Save()
-        doc.Close()
-        word.Quit()
-        time.sleep(1)
-        print(f"Watermark added to: {doc_path}")
+        with zipfile.ZipFile(doc_path, 'r') as zin:
+            document_xml = zin.read(DOCUMENT_PART).decode("utf-8")
+            rels_xml = zin.read(DOCUMENT_RELS_PART).decode("utf-8")
+            content_types_xml = zin.read(CONTENT_TYPES_PART).decode("utf-8")
+
+            new_document, new_rels, new_content_types, replaced_parts = add_missing_headers(
+                zin, document_xml, rels_xml, content_types_xml)
+            if new_document != document_xml:
+                replaced_parts[DOCUMENT_PART] = new_document.encode("utf-8")
+                replaced_parts[DOCUMENT_RELS_PART] = new_rels.encode("utf-8")
+                replaced_parts[CONTENT_TYPES_PART] = new_content_types.encode("utf-8")
+
+            header_parts = sorted({
+                resolve_target(attrs["Target"])
+                for attrs in (dict(ATTR_RE.findall(tag)) for tag in RELATIONSHIP_RE.findall(new_rels))
+                if attrs.get("Type") == HEADER_REL_TYPE and attrs.get("TargetMode") != "External"
+            })
+            for index, name in enumerate(header_parts, start=1):
+                xml = replaced_parts.get(name) or zin.read(name)
+                replaced_parts[name] = watermark_header(xml, index)
+
+            rewrite_package(zin, temp_path, replaced_parts)
+
+        os.replace(temp_path, doc_path)
+        return f"Watermark added to: {doc_path} ({len(header_parts)} header part(s))"
     except Exception as e:
-        print(f"Error processing {doc_path}: {str(e)}")
+        return f"Error processing {doc_path}: {str(e)}"
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+def process_file(path):
+    """Back up (if enabled) and watermark one file. Runs in a worker process; returns log lines."""
+    file_path = Path(path)
+    log = []
+
+    # Optional: Create backup before watermarking
+    if MAKE_BACKUP:
+        backup_path = file_path.with_suffix(".backup.docx")
+        if not backup_path.exists():
+            try:
+                shutil.copy2(str(file_path), str(backup_path))
+                log.append(f"Backup created: {backup_path}")
+            except Exception as e:
+                log.append(f"Warning: Could not create backup for {file_path}. Skipping. Error: {e}")
+                return log
+
+    log.append(add_watermark_to_doc(str(file_path)))
+    return log
+
+def is_backup_name(name):
+    """Backups made by this script (name.backup.docx)"""
+    return ".backup" in name
 
 def process_directory(root_dir):
     """Recursively add watermark to all .docx files (excluding temp and backup files)."""
@@ -76,28 +290,18 @@ def process_directory(root_dir):
     if not root_path.exists():
         print(f"Directory does not exist: {root_dir}")
         return
-    
-    for file_path in root_path.rglob("*.docx"):
-        if file_path.stem.startswith('~$'):
-            print(f"Skipping temporary file: {file_path}")
-            continue
-        if ".backup" in file_path.name:
-            print(f"Skipping backup file: {file_path}")
-            continue
-        
-        # Optional: Create backup before watermarking, comment if not needed
-        backup_path = file_path.with_suffix(".backup.docx")
-        if not backup_path.exists():
-            try:
-                shutil.copy2(str(file_path), str(backup_path))
-                print(f"Backup created: {backup_path}")
-            except Exception as e:
-                print(f"Warning: Could not create backup for {file_path}. Skipping. Error: {e}")
-                continue
-        
-        add_watermark_to_doc(str(file_path))
+
+    # Temp files are filtered out by iter_files; the backups this script makes are left out here
+    file_paths = iter_files(root_dir, (".docx",), skip=is_backup_name)
+    if WORKERS > 1:
+        with ProcessPoolExecutor(max_workers=WORKERS) as executor:
+            for log in executor.map(process_file, file_paths, chunksize=4):
+                print("\n".join(log))
+    else:
+        for file_path in file_paths:
+            print("\n".join(process_file(file_path)))
 
 if __name__ == "__main__":
     print("Starting watermark process...")
     process_directory(START_DIR)
-    print("Process complete.")
\ No newline at end of file
+    print("Process complete.")
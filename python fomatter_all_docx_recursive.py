@@ -6,14 +6,24 @@ Searches through all subfolders and preserves folder structure.
 
 from docx import Document
 from docx.shared import Pt, RGBColor
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
 import os
 from pathlib import Path
+from batch_manifest import Manifest, file_hash
+from file_discovery import iter_files
+from ooxml_package import save_docx
 
 class DocxFormatter:
+    # rPr attributes for bold/italic = True / False; None removes the element
+    _TOGGLE_ATTRS = {True: {qn('w:val'): None}, False: {qn('w:val'): '0'}, None: None}
+    
     def __init__(self, template_path):
         """Initialize with template document path"""
         self.template = Document(template_path)
+        self.template_hash = file_hash(template_path)
         self.styles = self._extract_styles()
+        self._patches = {key: self._rpr_patch(fmt) for key, fmt in self.styles.items()}
         
     def _extract_styles(self):
         """Extract font and paragraph styles from template"""
@@ -64,101 +74,155 @@ class DocxFormatter:
         if format_dict.get('color'):
             run.font.color.rgb = format_dict['color']
     
+    def _classify_style(self, style_name):
+        """Map a paragraph style name to (target format key, is heading)"""
+        style_name = style_name.lower().replace(' ', '')
+        for key in ('heading1', 'heading2', 'heading3'):
+            if key in style_name:
+                return key, True
+        return 'normal', False
+    
+    def _style_targets(self, doc):
+        """Build the style-id -> target table for a document (once per document)"""
+        targets = {}
+        default_target = ('normal', False)
+        for style in doc.styles.element.style_lst:
+            if style.type != WD_STYLE_TYPE.PARAGRAPH:
+                continue
+            target = self._classify_style(style.name_val or '')
+            targets[style.styleId] = target
+            if style.default:
+                default_target = target
+        return targets, default_target
+    
+    def _rpr_patch(self, format_dict):
+        """Precompute the rPr changes (font, size, color) a template format makes"""
+        patch = []
+        if format_dict.get('font_name'):
+            name = format_dict['font_name']
+            patch.append(('rFonts', {qn('w:ascii'): name, qn('w:hAnsi'): name}))
+        if format_dict.get('font_size'):
+            patch.append(('sz', {qn('w:val'): str(int(format_dict['font_size'].pt * 2))}))
+        if format_dict.get('color'):
+            patch.append(('color', {qn('w:val'): str(format_dict['color']), qn('w:themeColor'): None}))
+        return patch
+    
+    @staticmethod
+    def _on_off(rPr, tag):
+        """Read a bold/italic toggle from a run's rPr (True, False or None)"""
+        element = rPr.find(qn(f'w:{tag}')) if rPr is not None else None
+        if element is None:
+            return None
+        return element.get(qn('w:val')) not in ('0', 'false', 'off')
+    
+    @staticmethod
+    def _patch_matches(rPr, patch):
+        """True if the run already has every value in the patch"""
+        for tag, attrs in patch:
+            element = rPr.find(qn(f'w:{tag}')) if rPr is not None else None
+            if attrs is None:
+                if element is not None:
+                    return False
+                continue
+            if element is None:
+                return False
+            for key, value in attrs.items():
+                if element.get(key) != value:
+                    return False
+        return True
+    
+    def _apply_patch(self, r, patch):
+        """Apply an rPr patch to a run element. Runs that already match are left alone."""
+        if self._patch_matches(r.rPr, patch):
+            return False
+        rPr = r.get_or_add_rPr()
+        for tag, attrs in patch:
+            if attrs is None:
+                getattr(rPr, f'_remove_{tag}')()
+                continue
+            element = getattr(rPr, f'get_or_add_{tag}')()
+            for key, value in attrs.items():
+                if value is None:
+                    element.attrib.pop(key, None)
+                else:
+                    element.set(key, value)
+        return True
+    
     def format_document(self, input_path, output_path, preserve_emphasis=False, 
                         bold_headings=False, bold_first_line=False):
         """Apply template formatting to a document"""
         doc = Document(input_path)
+        style_targets, default_target = self._style_targets(doc)
         
-        for para in doc.paragraphs:
-            style_name = para.style.name.lower().replace(' ', '')
-            
+        for p in doc.element.body.p_lst:
             # Determine target style
-            if 'heading1' in style_name or 'heading 1' in style_name:
-                target_style = self.styles['heading1']
-                is_heading = True
-            elif 'heading2' in style_name or 'heading 2' in style_name:
-                target_style = self.styles['heading2']
-                is_heading = True
-            elif 'heading3' in style_name or 'heading 3' in style_name:
-                target_style = self.styles['heading3']
-                is_heading = True
-            else:
-                target_style = self.styles['normal']
-                is_heading = False
+            key, is_heading = style_targets.get(p.style, default_target)
+            target_style = self.styles[key]
+            patch = self._patches[key]
             
             # Apply formatting to each run
-            for i, run in enumerate(para.runs):
-                original_bold = run.font.bold
-                original_italic = run.font.italic
-                
-                # Apply font name and size from template
-                if target_style.get('font_name'):
-                    run.font.name = target_style['font_name']
-                if target_style.get('font_size'):
-                    run.font.size = target_style['font_size']
-                if target_style.get('color'):
-                    run.font.color.rgb = target_style['color']
+            for i, r in enumerate(p.r_lst):
+                original_bold = self._on_off(r.rPr, 'b')
+                original_italic = self._on_off(r.rPr, 'i')
                 
                 # Now handle bold/italic explicitly
-                if preserve_emphasis:
-                    # Keep original bold/italic ONLY if it was explicitly True
-                    if original_bold is True:
-                        run.font.bold = True
-                    elif original_bold is False:
-                        run.font.bold = False
-                    else:
-                        # If None/undefined, use template setting or default to False
-                        run.font.bold = target_style.get('bold', False)
-                    
-                    if original_italic is True:
-                        run.font.italic = True
-                    elif original_italic is False:
-                        run.font.italic = False
-                    else:
-                        run.font.italic = target_style.get('italic', False)
+                if preserve_emphasis and original_bold is not None:
+                    # Keep original bold/italic ONLY if it was explicitly set
+                    bold = original_bold
+                else:
+                    # If None/undefined (or not preserving), use template setting or default to False
+                    bold = target_style.get('bold', False)
+                
+                if preserve_emphasis and original_italic is not None:
+                    italic = original_italic
                 else:
-                    # Don't preserve - use template only
-                    run.font.bold = target_style.get('bold', False)
-                    run.font.italic = target_style.get('italic', False)
+                    italic = target_style.get('italic', False)
                 
                 # Override: Force bold on headings if enabled
                 if bold_headings and is_heading:
-                    run.font.bold = True
+                    bold = True
                 
                 # Override: Bold first run if enabled
                 if bold_first_line and i == 0 and not is_heading:
-                    run.font.bold = True
+                    bold = True
+                
+                self._apply_patch(r, patch + [('b', self._TOGGLE_ATTRS[bold]),
+                                              ('i', self._TOGGLE_ATTRS[italic])])
         
-        doc.save(output_path)
+        save_docx(doc, input_path, output_path)  # unchanged images etc. are copied, not recompressed
         print(f"✓ Formatted: {os.path.basename(input_path)}")
     
     def batch_format(self, input_folder, output_folder, recursive=True,
-                    preserve_emphasis=False, bold_headings=False, bold_first_line=False):
-        """Format all DOCX files in a folder"""
+                    preserve_emphasis=False, bold_headings=False, bold_first_line=False,
+                    use_manifest=True):
+        """Format all DOCX files in a folder
+
+        With use_manifest, files formatted before with the same template and
+        options (and still present in the output folder) are skipped.
+        """
         input_path = Path(input_folder)
         output_path = Path(output_folder)
         
         output_path.mkdir(exist_ok=True)
         
-        # Find all DOCX files
-        if recursive:
-            docx_files = list(input_path.rglob("*.docx"))
-        else:
-            docx_files = list(input_path.glob("*.docx"))
-        
-        # Filter out temp files and output folder files
-        docx_files = [f for f in docx_files 
-                     if not f.name.startswith("~$") 
-                     and not str(f).startswith(str(output_path))]
-        
-        if not docx_files:
-            print(f"\nNo DOCX files found in {input_folder}")
-            return
+        manifest = None
+        if use_manifest:
+            manifest = Manifest(str(input_path), "format_docx", {
+                "template": self.template_hash,
+                "output_folder": str(output_path),
+                "recursive": recursive,
+                "preserve_emphasis": preserve_emphasis,
+                "bold_headings": bold_headings,
+                "bold_first_line": bold_first_line,
+            })
+        found = 0
+        skipped = 0
         
-        print(f"\nFound {len(docx_files)} document(s) to format\n")
-        
-        # Process each file
-        for docx_file in docx_files:
+        # Process each file as it is found (temp files and the output folder are left out)
+        for docx_path in iter_files(input_folder, (".docx",), exclude=[output_folder],
+                                    recursive=recursive):
+            docx_file = Path(docx_path)
+            found += 1
             try:
                 if recursive:
                     rel_path = docx_file.relative_to(input_path)
@@ -167,11 +231,26 @@ class DocxFormatter:
                 else:
                     out_file = output_path / docx_file.name
                 
+                if manifest and out_file.exists() and manifest.is_done(str(docx_file)):
+                    skipped += 1
+                    continue
+                
                 self.format_document(str(docx_file), str(out_file), 
                                    preserve_emphasis, bold_headings, bold_first_line)
+                if manifest:
+                    manifest.record(str(docx_file))
             except Exception as e:
                 print(f"✗ Error formatting {docx_file.name}: {str(e)}")
         
+        if manifest:
+            manifest.close()
+        if not found:
+            print(f"\nNo DOCX files found in {input_folder}")
+            return
+        print(f"\nFound {found} document(s)")
+        if skipped:
+            print(f"\n⏭ Skipped {skipped} unchanged document(s) already formatted")
+        
         print(f"\n✓ All done! Check: {output_folder}")
 
 
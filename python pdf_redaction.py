@@ -1,16 +1,16 @@
 import fitz  # PyMuPDF
 import re
 import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 
 # --- CONFIGURATION ---
 input_folder = "PDF_Input"
 output_folder = "PDF_Cleaned"
 log_file = "Batch_Redaction_Log.txt"
-
-# Create folders if not exist
-os.makedirs(input_folder, exist_ok=True)
-os.makedirs(output_folder, exist_ok=True)
+page_workers = os.cpu_count() or 1  # Worker processes for large PDFs (1 = redact every PDF in this process)
+parallel_min_pages = 200  # PDFs with at least this many pages are split into page ranges across the workers
 
 # Custom confidential triggers
 confidential_terms = [
@@ -32,71 +32,303 @@ patterns = {
 # Redaction mode: "blackout" or "replace"
 mode = "blackout"
 
-# --- MAIN PROCESS ---
-log_entries = []
-timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-log_entries.append(f"PDF REDACTION BATCH LOG – {timestamp}\n")
+# Redaction scope: "block" (the whole paragraph around a match) or "span" (only the matched text)
+scope = "block"
+
+# Middle part of a line's height that a span redaction covers: MuPDF removes every glyph whose box
+# touches a redaction, and on tightly spaced lines the boxes above and below reach into the line
+span_band = 0.6
+check_neighbours = False  # Diagnostic: re-read each span-redacted page and log lines without a match that lost text
+
+# --- COMPILED RULES ---
+def build_redaction_rules():
+    """Compile all terms and patterns once.
+
+    Returns the combined pattern (one named group per rule) and the list of
+    (group name, label, compiled rule) in reporting order.
+    """
+    rules = []
+    for i, term in enumerate(confidential_terms):
+        rules.append((f"term{i}", term, f"(?i:{re.escape(term)})"))  # terms are case-insensitive
+    for i, (label, pattern) in enumerate(patterns.items()):
+        rules.append((f"pattern{i}", label, pattern))
 
-for file_name in os.listdir(input_folder):
-    if not file_name.lower().endswith(".pdf"):
-        continue
+    combined = re.compile("|".join(f"(?P<{group}>{regex})" for group, label, regex in rules))
+    return combined, [(group, label, re.compile(regex)) for group, label, regex in rules]
 
-    input_pdf = os.path.join(input_folder, file_name)
-    output_pdf = os.path.join(output_folder, f"Cleaned_{file_name}")
-    print(f"🔍 Processing: {file_name}")
+combined_pattern, redaction_rules = build_redaction_rules()
+rule_labels = [label for group, label, rule in redaction_rules]
 
+def find_labels(text):
+    """Labels of every term/pattern found in text, in configuration order."""
+    found = {match.lastgroup for match in combined_pattern.finditer(text)}
+    if not found:
+        return []
+    # Overlapping hits hide each other in the combined scan, so check the rest one by one
+    for group, label, rule in redaction_rules:
+        if group not in found and rule.search(text):
+            found.add(group)
+    return [label for group, label, rule in redaction_rules if group in found]
+
+def find_spans(text):
+    """(start, end, label) of every match of every term/pattern in text."""
+    # Any rule that matches makes the combined pattern match too, so most pages stop here
+    if not combined_pattern.search(text):
+        return []
+    # Each rule on its own, so matches that overlap another rule's are not lost
+    return [(match.start(), match.end(), label)
+            for group, label, rule in redaction_rules
+            for match in rule.finditer(text) if match.end() > match.start()]
+
+# --- PAGE TEXT MAP ---
+def page_text_map(page):
+    """Extract a page's text once, with the position of every character.
+
+    Returns (text, chars). As in get_text("blocks"), lines end with a newline
+    and blocks are separated by another one. chars[i] is (block number,
+    line number, bbox) for text[i], or None for those separators.
+    """
+    text = []
+    chars = []
+    line_number = 0
+    # Glyph boxes as tall as the font size: full-height boxes overlap the lines above and below
+    small_glyph_heights = fitz.TOOLS.set_small_glyph_heights()
+    fitz.TOOLS.set_small_glyph_heights(True)
     try:
-        doc = fitz.open(input_pdf)
+        blocks = page.get_text("rawdict", flags=fitz.TEXTFLAGS_BLOCKS)["blocks"]
+    finally:
+        fitz.TOOLS.set_small_glyph_heights(small_glyph_heights)
+    for block_number, block in enumerate(blocks):
+        if block["type"] != 0:
+            continue
+        for line in block["lines"]:
+            for span in line["spans"]:
+                for char in span["chars"]:
+                    for c in char["c"]:
+                        text.append(c)
+                        chars.append((block_number, line_number, char["bbox"]))
+            text.append("\n")
+            chars.append(None)
+            line_number += 1
+        text.append("\n")
+        chars.append(None)
+    return "".join(text), chars
+
+def span_rects(chars, start, end):
+    """Tight rectangles around text[start:end], one per line it covers."""
+    rects = {}
+    for entry in chars[start:end]:
+        if entry is None:
+            continue
+        block_number, line_number, bbox = entry
+        if line_number in rects:
+            rects[line_number].include_rect(bbox)
+        else:
+            rects[line_number] = fitz.Rect(bbox)
+    return list(rects.values())
+
+def removal_rect(rect):
+    """The middle span_band of a line rect: still touches every glyph on the line, but not the lines beside it."""
+    margin = rect.height * (1 - span_band) / 2
+    return fitz.Rect(rect.x0, rect.y0 + margin, rect.x1, rect.y1 - margin)
+
+def lost_lines(page, text, chars, redacted_lines):
+    """Lines of the page text taken before redaction, which had no match, that lost text since."""
+    line_texts = {}
+    for c, entry in zip(text, chars):
+        if entry is not None and entry[1] not in redacted_lines:
+            line_texts.setdefault(entry[1], []).append(c)
+    # Compared without whitespace, which extraction may space differently after the redaction
+    remaining = "".join(page_text_map(page)[0].split())
+    lines = ("".join(line_chars).strip() for line_chars in line_texts.values())
+    return [line for line in lines if line and "".join(line.split()) not in remaining]
+
+# --- REDACTION ---
+def redact_page(page, page_num, file_log):
+    """Redact one page in the configured scope. Returns True if anything was redacted."""
+    if scope == "block":
+        return redact_page_blocks(page, page_num, file_log)
+
+    # One text extraction; every term and pattern is matched against the same string
+    text, chars = page_text_map(page)
+    block_labels = {}
+    redacted_lines = set()
+    covers = []
+    for start, end, label in find_spans(text):
+        rects = span_rects(chars, start, end)
+        for rect in rects:
+            page.add_redact_annot(removal_rect(rect), fill=(0, 0, 0))
+        covers.extend(rects)
+        if rects:
+            block_number = next(entry[0] for entry in chars[start:end] if entry is not None)
+            block_labels.setdefault(block_number, set()).add(label)
+            redacted_lines.update(entry[1] for entry in chars[start:end] if entry is not None)
+
+    # One log line per redacted block, as in block scope
+    for block_number in sorted(block_labels):
+        labels = [label for label in rule_labels if label in block_labels[block_number]]
+        file_log.append(f"Page {page_num}: Redacted ({', '.join(labels)})")
+
+    # Pages without hits have nothing to apply
+    if block_labels:
+        page.apply_redactions()
+        # The text is gone; black out the matches' full line height again (the band is too short for the label)
+        for rect in covers:
+            page.draw_rect(rect, color=None, fill=(0, 0, 0))
+            if mode == "replace":
+                page.insert_text((rect.x0, rect.y1 - rect.height * 0.2), "[REDACTED]", fontsize=rect.height * 0.8)
+        # A second text extraction per redacted page, so only when asked for
+        if check_neighbours:
+            for line in lost_lines(page, text, chars, redacted_lines):
+                file_log.append(f"Page {page_num}: ⚠️ Text next to a redaction was removed too: '{line}'")
+    return bool(block_labels)
+
+def redact_page_blocks(page, page_num, file_log):
+    """Redact every triggered text block of one page. Returns True if anything was redacted."""
+    page_hit = False
+    for block in page.get_text("blocks"):
+        # Keyword and pattern triggers in one scan
+        found_labels = find_labels(block[4])
+
+        # Redact if triggered
+        if found_labels:
+            page_hit = True
+            rect = fitz.Rect(block[0], block[1], block[2], block[3])
+            page.add_redact_annot(
+                rect,
+                text="[REDACTED PARAGRAPH]" if mode == "replace" else None,
+                fill=(0, 0, 0)
+            )
+            file_log.append(f"Page {page_num}: Redacted ({', '.join(found_labels)})")
+
+    # Pages without hits have nothing to apply
+    if page_hit:
+        page.apply_redactions()
+    return page_hit
+
+def redact_page_range(input_pdf, first, last):
+    """Redact pages first..last-1 (0-based) in a worker process, which opens the file itself.
+
+    Returns (log lines, indexes of the redacted pages, PDF bytes holding just
+    those pages, or None when nothing was redacted).
+    """
+    with fitz.open(input_pdf) as doc:
         file_log = []
+        redacted = [page_index for page_index in range(first, last)
+                    if redact_page(doc[page_index], page_index + 1, file_log)]
+        if not redacted:
+            return file_log, redacted, None
+        doc.select(redacted)
+        return file_log, redacted, doc.tobytes(garbage=1)
+
+def merge_redacted_pages(doc, results):
+    """Swap the redacted pages from the workers into doc, in place.
+
+    Rearranging the pages drops the outline, the page labels and links that
+    point to a replaced page, so these are restored afterwards.
+    """
+    toc = doc.get_toc(simple=False)
+    page_labels = doc.get_page_labels()
+    links = {}
+    for page in doc:
+        goto_links = [link for link in page.get_links() if link["kind"] == fitz.LINK_GOTO]
+        if goto_links:
+            links[page.number] = goto_links
 
-        for page_num, page in enumerate(doc, start=1):
-            text_blocks = page.get_text("blocks")
-
-            for block in text_blocks:
-                block_text = block[4]
-                trigger = False
-                found_labels = []
-
-                # Keyword triggers
-                for term in confidential_terms:
-                    if re.search(re.escape(term), block_text, re.IGNORECASE):
-                        trigger = True
-                        found_labels.append(term)
-
-                # Pattern triggers
-                for label, pattern in patterns.items():
-                    if re.search(pattern, block_text):
-                        trigger = True
-                        found_labels.append(label)
-
-                # Redact if triggered
-                if trigger:
-                    rect = fitz.Rect(block[0], block[1], block[2], block[3])
-                    page.add_redact_annot(
-                        rect,
-                        text="[REDACTED PARAGRAPH]" if mode == "replace" else None,
-                        fill=(0, 0, 0)
-                    )
-                    file_log.append(f"Page {page_num}: Redacted ({', '.join(found_labels)})")
-
-            page.apply_redactions()
-
-        doc.save(output_pdf)
-        doc.close()
-
-        log_entries.append(f"\n=== {file_name} ===")
-        if file_log:
-            log_entries.extend(file_log)
+    # Append the redacted pages, then keep one copy of every page in the original order
+    # (deleting pages one by one rescans the whole document's links each time)
+    order = list(range(doc.page_count))
+    for file_log, redacted, data in results:
+        if data is None:
+            continue
+        with fitz.open("pdf", data) as part:
+            start = doc.page_count
+            doc.insert_pdf(part)
+        for offset, page_index in enumerate(redacted):
+            order[page_index] = start + offset
+    doc.select(order)
+
+    if toc:
+        doc.set_toc(toc)
+    if page_labels:
+        doc.set_page_labels(page_labels)
+    for page_index, goto_links in links.items():
+        page = doc[page_index]
+        present = {(tuple(link["from"]), link.get("page")) for link in page.get_links()
+                   if link["kind"] == fitz.LINK_GOTO}
+        for link in goto_links:
+            if (tuple(link["from"]), link.get("page")) not in present:
+                page.insert_link(link)
+
+def redact_file(input_pdf, output_pdf, executor):
+    """Redact one PDF into output_pdf. Returns the log lines, in page order."""
+    with fitz.open(input_pdf) as doc:
+        file_log = []
+        if executor is not None and doc.page_count >= parallel_min_pages:
+            # Several ranges per worker, so one slow range doesn't leave the others idle
+            step = -(-doc.page_count // (page_workers * 4))
+            futures = [executor.submit(redact_page_range, input_pdf, first, min(first + step, doc.page_count))
+                       for first in range(0, doc.page_count, step)]
+            results = [future.result() for future in futures]  # in page order
+            for range_log, redacted, data in results:
+                file_log.extend(range_log)
+            if file_log:
+                merge_redacted_pages(doc, results)
+                # garbage collection drops the replaced pages, so none of their text stays in the file
+                doc.save(output_pdf, garbage=3)
         else:
-            log_entries.append("No redactions applied.")
-        print(f"✅ Cleaned: {output_pdf}")
+            for page in doc:
+                redact_page(page, page.number + 1, file_log)
+            if file_log:
+                doc.save(output_pdf)
+
+    if not file_log:
+        # Nothing redacted: copy the original instead of re-saving it
+        shutil.copyfile(input_pdf, output_pdf)
+    return file_log
+
+# --- MAIN PROCESS ---
+def main():
+    # Create folders if not exist
+    os.makedirs(input_folder, exist_ok=True)
+    os.makedirs(output_folder, exist_ok=True)
+
+    log_entries = []
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    log_entries.append(f"PDF REDACTION BATCH LOG – {timestamp}\n")
+
+    executor = ProcessPoolExecutor(max_workers=page_workers) if page_workers > 1 else None
+    try:
+        for file_name in os.listdir(input_folder):
+            if not file_name.lower().endswith(".pdf"):
+                continue
+
+            input_pdf = os.path.join(input_folder, file_name)
+            output_pdf = os.path.join(output_folder, f"Cleaned_{file_name}")
+            print(f"🔍 Processing: {file_name}")
+
+            try:
+                file_log = redact_file(input_pdf, output_pdf, executor)
+
+                log_entries.append(f"\n=== {file_name} ===")
+                if file_log:
+                    log_entries.extend(file_log)
+                else:
+                    log_entries.append("No redactions applied.")
+                print(f"✅ Cleaned: {output_pdf}")
+
+            except Exception as e:
+                log_entries.append(f"\nERROR processing {file_name}: {str(e)}")
+                print(f"⚠️ Error processing {file_name}: {e}")
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-    except Exception as e:
-        log_entries.append(f"\nERROR processing {file_name}: {str(e)}")
-        print(f"⚠️ Error processing {file_name}: {e}")
+    # --- SAVE MASTER LOG ---
+    with open(log_file, "w", encoding="utf-8") as f:
+        f.write("\n".join(log_entries))
 
-# --- SAVE MASTER LOG ---
-with open(log_file, "w", encoding="utf-8") as f:
-    f.write("\n".join(log_entries))
+    print(f"\n📄 Batch completed. Log saved to: {log_file}")
 
-print(f"\n📄 Batch completed. Log saved to: {log_file}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+DOCX Release Pipeline
+Runs the monthly release edits (remove lock, replace text, set header,
+change author) as stages on one in-memory document per file, so every
+.docx is walked, parsed and saved once instead of once per script.
+"""
+
+import os
+from collections import Counter
+from io import BytesIO
+from docx import Document
+from docx.opc.exceptions import PackageNotFoundError
+from docx.oxml.ns import qn
+from batch_manifest import Manifest
+from file_discovery import iter_files
+from file_timing import RunTimer
+from ooxml_package import docx_entries, write_entries
+from header_stamp import HeaderStamp
+from text_replace import ReplacementTable, load_replacements, replace_text_in_paragraph
+
+# ---------- SETTINGS ----------
+root_folder = r"C:\Users\judep\Downloads\FORMS EDITING\UNLOCKED"
+stages = ["remove_lock", "replace", "header", "author"]  # Applied in this order
+
+# remove_lock
+tags_to_remove = [
+    "w:documentProtection",
+    "w:writeProtection",
+    "w:readOnlyRecommended",
+    "w:enforcement"
+]
+
+# replace
+find_text = "VEM FORMS REMOVED FOR MANUAL REVISION"
+replace_text = "Mention intentionally removed."
+replacements_file = None  # Optional .csv/.json table of find → replace pairs (used instead of find_text/replace_text)
+
+# header
+header_rev = "Rev 0 / 2025-11-17"
+footer_patterns = [
+    r"Page\s+\d+\s+of\s+\d+",
+    r"Issue\s+Number:\s*\d+",
+    r"Revision\s+Number:\s*\d+"
+]
+
+# author
+new_author = "LMMS"
+
+use_manifest = True  # Skip files unchanged since their last successful run with the same settings
+timing_log = None  # JSON Lines file for per-file, per-stage timings and bytes read/written (None = no log)
+profile_slowest = 0  # Profile every file and show the N slowest at the end (0 = off)
+profiler = "cprofile"  # "cprofile" (where the time goes) or "tracemalloc" (where the memory goes)
+# ------------------------------
+
+if replacements_file:
+    replacement_pairs = load_replacements(replacements_file)
+else:
+    replacement_pairs = [(find_text, replace_text)]
+replacement_table = ReplacementTable(replacement_pairs)
+header_stamp = HeaderStamp(header_rev, footer_patterns)
+pair_hits = Counter()
+
+
+# -------- STAGES --------
+# Each stage edits the open Document and returns a short note for the
+# report, or None if it changed nothing.
+
+def stage_remove_lock(doc):
+    """Remove editing protection from word/settings.xml."""
+    settings = doc.settings.element
+    removed = [element for tag in tags_to_remove for element in settings.findall(qn(tag))]
+    for element in removed:
+        settings.remove(element)
+    return "unlocked" if removed else None
+
+
+def table_paragraphs(table):
+    """Paragraphs of every (distinct) cell of a table."""
+    seen = set()
+    try:
+        cells = table._cells
+    except (IndexError, AttributeError):
+        return
+    for cell in cells:
+        if id(cell._tc) in seen:  # merged cells repeat in _cells
+            continue
+        seen.add(id(cell._tc))
+        yield from cell.paragraphs
+
+
+def story_paragraphs(doc):
+    """Body, table, header and footer paragraphs; each header/footer part once."""
+    yield from doc.paragraphs
+    for table in doc.tables:
+        yield from table_paragraphs(table)
+    for section in doc.sections:
+        for part in (section.header, section.footer):
+            # Linked parts belong to an earlier section and were already visited
+            if part.is_linked_to_previous:
+                continue
+            yield from part.paragraphs
+            for table in part.tables:
+                yield from table_paragraphs(table)
+
+
+def stage_replace(doc):
+    """Find/replace in all story paragraphs, keeping run formatting."""
+    hits = Counter()
+    for paragraph in story_paragraphs(doc):
+        replace_text_in_paragraph(paragraph, replacement_table, hits)
+    pair_hits.update(hits)
+    count = sum(hits.values())
+    return f"{count} replacement(s)" if count else None
+
+
+def stage_header(doc):
+    """Clean Page X of Y / Issue / Revision from the footers and set the SSP header."""
+    cleaned = len(header_stamp.clean_footers(doc))
+    stamped = header_stamp.stamp_headers(doc)
+    notes = (["header set"] if stamped else []) + ([f"{cleaned} footer line(s) removed"] if cleaned else [])
+    return ", ".join(notes) or None
+
+
+def stage_author(doc):
+    """Set author and last modified by in the core properties."""
+    core_props = doc.core_properties
+    if core_props.author == new_author and core_props.last_modified_by == new_author:
+        return None
+    core_props.author = new_author
+    core_props.last_modified_by = new_author
+    return "author set"
+
+
+STAGES = {
+    "remove_lock": stage_remove_lock,
+    "replace": stage_replace,
+    "header": stage_header,
+    "author": stage_author,
+}
+
+
+# -------- MAIN --------
+def process_file(full_path, pipeline, timer):
+    """Run every stage on one document and save it once; each stage is timed as its own phase.
+
+    Returns (status, notes); status is "updated", "unchanged" or "skipped".
+    """
+    try:
+        data = timer.read_file(full_path)
+        with timer.phase("parse"):
+            doc = Document(BytesIO(data))
+    except PackageNotFoundError:
+        return "skipped", ["corrupted or password protected"]
+    except Exception as e:
+        return "skipped", [f"error reading file: {e}"]
+
+    notes = []
+    for name, stage in pipeline:
+        with timer.phase(name):
+            note = stage(doc)
+        if note:
+            notes.append(note)
+
+    if not notes:
+        return "unchanged", notes
+    # Only parts whose bytes changed are compressed again; images etc. are copied as they are
+    with timer.phase("serialize"):
+        entries = docx_entries(doc)
+    with timer.phase("write"):
+        written = write_entries(full_path, entries, full_path)
+    if not written:
+        return "unchanged", []  # every part serialized to the bytes already there
+    timer.bytes_written += os.path.getsize(full_path)
+    return "updated", notes
+
+
+def main():
+    unknown = [name for name in stages if name not in STAGES]
+    if unknown:
+        print(f"⚠️ Unknown stage(s): {', '.join(unknown)}. Available: {', '.join(STAGES)}")
+        return
+    pipeline = [(name, STAGES[name]) for name in stages]
+
+    manifest = None
+    if use_manifest:
+        manifest = Manifest(root_folder, "release_pipeline", {
+            "stages": stages,
+            "tags_to_remove": tags_to_remove,
+            "pairs": replacement_pairs,
+            "header_rev": header_rev,
+            "footer_patterns": footer_patterns,
+            "new_author": new_author,
+        })
+
+    counts = Counter()
+    run_timer = RunTimer(timing_log, profile_slowest, profiler)
+    for full_path in iter_files(root_folder, (".docx",)):
+        if manifest and manifest.is_done(full_path):
+            counts["unchanged since last run"] += 1
+            continue
+
+        timer = run_timer.start(full_path)
+        status, notes = process_file(full_path, pipeline, timer)
+        run_timer.add(timer.finish())
+        counts[status] += 1
+        if status == "updated":
+            print(f"✅ {full_path}: {', '.join(notes)}")
+        elif status == "unchanged":
+            print(f"— No change: {full_path}")
+        else:
+            print(f"⚠️ Skipped {full_path} ({notes[0]})")
+
+        if status != "skipped" and manifest:
+            manifest.record(full_path)
+
+    if manifest:
+        manifest.close()
+
+    print(f"\n✅ Stages: {' → '.join(stages)}")
+    for status, count in counts.items():
+        print(f"   {count:>6} {status}")
+    if pair_hits:
+        print("📝 Replacements:")
+        for find, hits in pair_hits.most_common():
+            print(f"   {hits:>6} × '{find}'")
+    if timing_log or profile_slowest:
+        run_timer.summary()
+    print("Done!")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,96 +1,103 @@
 import zipfile
 import os
-import shutil
-import tempfile
+from batch_manifest import Manifest
+from file_discovery import iter_files
+from ooxml_package import rewrite_package
 
 # --- SETTINGS ---
 input_folder = r"C:\Users\judep\Downloads\FORMS EDITING\5. VEM"  # Folder containing .docx files
 output_folder = r"C:\Users\judep\Downloads\FORMS EDITING\UNLOCKED"  # Where to save unlocked files
+use_manifest = True  # Skip files unchanged since their last successful run
 
 # ------------------
 
+SETTINGS_PART = "word/settings.xml"
+
+# Tags that lock editing
+tags_to_remove = [
+    "w:documentProtection",
+    "w:writeProtection",
+    "w:readOnlyRecommended",
+    "w:enforcement"
+]
+
+def remove_protection(xml):
+    """Strip the locking tags from settings.xml. Returns (xml, protection_found)."""
+    protection_found = False
+    for tag in tags_to_remove:
+        while tag in xml:
+            start = xml.find(f"<{tag}")
+            if start == -1:
+                break
+            end = xml.find("/>", start)
+            if end == -1:
+                break
+            xml = xml[:start] + xml[end+2:]
+            protection_found = True
+    return xml, protection_found
+
 # Create output folder if it doesn't exist
 os.makedirs(output_folder, exist_ok=True)
 
 count_unlocked = 0
+count_skipped = 0
+count_unchanged = 0
 count_failed = 0
 
-# Walk through all subdirectories
-for foldername, subfolders, filenames in os.walk(input_folder):
-    for filename in filenames:
-        if not filename.endswith(".docx"):
-            continue
-        
-        input_file = os.path.join(foldername, filename)
-        output_file = os.path.join(output_folder, filename)
-        
-        try:
-            # Create temporary folder
-            temp_dir = tempfile.mkdtemp()
-            
-            # Extract docx (ZIP)
-            with zipfile.ZipFile(input_file, 'r') as zip_ref:
-                zip_ref.extractall(temp_dir)
-            
-            settings_path = os.path.join(temp_dir, "word", "settings.xml")
-            
+manifest = None
+if use_manifest:
+    manifest = Manifest(input_folder, "remove_lock",
+                        {"output_folder": output_folder, "tags_to_remove": tags_to_remove})
+
+# Walk through all subdirectories (the output folder may live inside the input folder)
+for input_file in iter_files(input_folder, (".docx",), exclude=[output_folder]):
+    filename = os.path.basename(input_file)
+    output_file = os.path.join(output_folder, filename)
+
+    if manifest and manifest.is_done(input_file):
+        count_unchanged += 1
+        continue
+
+    try:
+        with zipfile.ZipFile(input_file, 'r') as zin:
             # Check if settings.xml exists
-            if not os.path.exists(settings_path):
+            if SETTINGS_PART not in zin.NameToInfo:
                 print(f"⚠️ No settings.xml in {filename}, skipping.")
-                shutil.rmtree(temp_dir)
                 continue
-            
-            # Remove protection tags
-            with open(settings_path, "r", encoding="utf-8") as f:
-                xml = f.read()
-            
-            # Tags that lock editing
-            tags_to_remove = [
-                "w:documentProtection",
-                "w:writeProtection",
-                "w:readOnlyRecommended",
-                "w:enforcement"
-            ]
-            
-            protection_found = False
-            for tag in tags_to_remove:
-                while tag in xml:
-                    start = xml.find(f"<{tag}")
-                    if start == -1:
-                        break
-                    end = xml.find("/>", start)
-                    if end == -1:
-                        break
-                    xml = xml[:start] + xml[end+2:]
-                    protection_found = True
-            
-            # Write cleaned XML
-            with open(settings_path, "w", encoding="utf-8") as f:
-                f.write(xml)
-            
-            # Repack into new unlocked file
-            with zipfile.ZipFile(output_file, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(temp_dir):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        arcname = os.path.relpath(file_path, temp_dir)
-                        zipf.write(file_path, arcname)
-            
-            # Clean up
-            shutil.rmtree(temp_dir)
-            
-            status = "🔓 Unlocked" if protection_found else "✅ No protection found"
-            print(f"{status}: {filename}")
-            count_unlocked += 1
-            
-        except Exception as e:
-            print(f"❌ Failed to process {filename}: {e}")
-            count_failed += 1
-            if os.path.exists(temp_dir):
-                shutil.rmtree(temp_dir)
-            continue
-
-print(f"\n✅ Processed {count_unlocked} files.")
+
+            # Remove protection tags in memory
+            xml = zin.read(SETTINGS_PART).decode("utf-8")
+            xml, protection_found = remove_protection(xml)
+
+            if not protection_found:
+                # Nothing to unlock, so don't write an output copy at all
+                print(f"✅ No protection found: {filename}")
+                count_skipped += 1
+                if manifest:
+                    manifest.record(input_file)
+                continue
+
+            # Repack: only settings.xml is re-encoded, every other entry is copied raw
+            rewrite_package(zin, output_file, {SETTINGS_PART: xml.encode("utf-8")})
+
+        print(f"🔓 Unlocked: {filename}")
+        count_unlocked += 1
+        if manifest:
+            # Done only while the unlocked copy is still there
+            manifest.record(input_file, output_file)
+
+    except Exception as e:
+        print(f"❌ Failed to process {filename}: {e}")
+        count_failed += 1
+        continue
+
+if manifest:
+    manifest.close()
+
+print(f"\n✅ Processed {count_unlocked + count_skipped} files.")
+print(f"⏭️ Unchanged since last run: {count_unchanged} files.")
+print(f"🔓 Unlocked: {count_unlocked} files.")
+print(f"⏭️ Not written (no protection): {count_skipped} files.")
 print(f"❌ Failed: {count_failed} files.")
 print(f"📁 Unlocked files saved to: {output_folder}")
 
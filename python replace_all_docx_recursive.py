@@ -2,56 +2,64 @@ import os
 from docx import Document
 import sys
 import re
-import subprocess
-
-print(sys.executable)
+import zipfile
+from io import BytesIO
+from html import unescape
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from batch_manifest import Manifest
+from batch_pipeline import run_pipeline
+from docx_stream import NS_DECL_RE, W_NS, UnsupportedStory, replace_in_docx
+from file_discovery import iter_files
+from file_timing import FileTimer, RunTimer
+from office_convert import BatchConverter
+from ooxml_package import docx_entries, entries_to_bytes, write_entries
+from text_index import TextIndex, path_key
+from text_replace import ReplacementTable, load_replacements, replace_text_in_paragraph
 
 # SETTINGS – edit these before running
 root_folder = r"C:\Users\judep\Downloads\FORMS EDITING\UNLOCKED"
 find_text = "VEM FORMS REMOVED FOR MANUAL REVISION"
 replace_text = "Mention intentionally removed."
+replacements_file = None  # Optional .csv/.json table of find → replace pairs (used instead of find_text/replace_text)
+workers = os.cpu_count() or 1  # Number of worker processes (1 = process files one by one)
+converter_instances = 2  # LibreOffice runs converting .doc files side by side, in batches (each with its own profile)
+prefilter = True  # Scan the raw XML first and skip files that can't contain find_text
+use_manifest = True  # Skip files unchanged since their last successful run with the same find/replace pairs
+use_index = False  # Only open files the full-text index (text_index.py) lists as containing a find term
+stream_above_mb = 50  # Edit larger files paragraph by paragraph without loading them (docx_stream.py; None = never)
+timing_log = None  # JSON Lines file for per-file phase timings and bytes read/written (None = no log)
+profile_slowest = 0  # Profile every file and show the N slowest at the end (0 = off)
+profiler = "cprofile"  # "cprofile" (where the time goes) or "tracemalloc" (where the memory goes)
+pipeline = False  # Read ahead and write behind on threads while workers edit (batch_pipeline.py; for network shares and slow disks)
+io_threads = 8  # Reader and writer threads each, when pipeline is on
+memory_budget_mb = 512  # Most file bytes held in memory at once across the pipeline
 
 # --- Do not edit below this line ---
-count_files = 0
-count_replaced = 0
-count_converted = 0
-
-# Compile a regex pattern for case-insensitive find
-pattern = re.compile(re.escape(find_text), re.IGNORECASE)
-
-def replace_text_in_paragraph(paragraph, pattern, replace_text):
-    """Simple text replacement in paragraph."""
-    if pattern.search(paragraph.text):
-        # Get the full text
-        full_text = paragraph.text
-        # Replace it
-        new_text = pattern.sub(replace_text, full_text)
-        # Clear the paragraph
-        paragraph.clear()
-        # Add the new text
-        paragraph.add_run(new_text)
-        return True
-    return False
 
-def convert_doc_to_docx(doc_path):
-    """Convert .doc file to .docx using LibreOffice or MS Word if available."""
-    try:
-        docx_path = doc_path.replace(".doc", ".docx")
-        subprocess.run([
-            "soffice", "--headless", "--convert-to", "docx", "--outdir",
-            os.path.dirname(doc_path), doc_path
-        ], capture_output=True, timeout=30)
-        
-        if os.path.exists(docx_path):
-            return docx_path
-    except Exception:
-        pass
-    
+# Story parts searched by the script: body (incl. tables), headers and footers
+STORY_PART_RE = re.compile(r"word/(document|header\d*|footer\d*)\.xml")
+# Start tag of a part's root element, which declares the namespace prefixes (attribute values may contain '>')
+ROOT_TAG_RE = re.compile(r"""<(?![?!])(?:[^>"']|"[^"]*"|'[^']*')*>""")
+# Text-bearing tokens of WordprocessingML: <w:t> text, tab/break characters and paragraph ends
+# ({w} is the prefix the part binds the namespace to)
+STORY_TOKEN_PATTERN = r"<{w}:t(?:\s[^>]*)?>([^<]*)</{w}:t>|<{w}:(tab|br|cr)\b[^>]*/>|</{w}:p>"
+story_token_res = {}
+
+# Compile every find term into one case-insensitive matcher
+if replacements_file:
+    replacement_pairs = load_replacements(replacements_file)
+else:
+    replacement_pairs = [(find_text, replace_text)]
+replacement_table = ReplacementTable(replacement_pairs)
+
+def convert_doc_with_word(doc_path):
+    """Convert .doc file to .docx using MS Word, for files LibreOffice could not convert."""
     try:
         import win32com.client
         word = win32com.client.Dispatch("Word.Application")
         word.Visible = False
-        docx_path = doc_path.replace(".doc", ".docx")
+        docx_path = os.path.splitext(doc_path)[0] + ".docx"
         word.Documents.Open(os.path.abspath(doc_path))
         word.ActiveDocument.SaveAs(os.path.abspath(docx_path), FileFormat=12)
         word.ActiveDocument.Close()
@@ -59,93 +67,317 @@ def convert_doc_to_docx(doc_path):
         return docx_path
     except Exception:
         pass
-    
+
     return None
 
-for foldername, subfolders, filenames in os.walk(root_folder):
-    for filename in filenames:
-        if filename.endswith(".docx") or filename.endswith(".doc"):
-            file_path = os.path.join(foldername, filename)
-            
-            if filename.endswith(".doc"):
-                print(f"🔄 Converting {filename} to .docx...")
-                converted_path = convert_doc_to_docx(file_path)
-                if converted_path:
-                    file_path = converted_path
-                    count_converted += 1
-                    print(f"✅ Converted: {converted_path}")
-                else:
-                    print(f"⚠️ Could not convert {filename}. Skipping.")
-                    continue
-            
-            try:
-                doc = Document(file_path)
-            except Exception as e:
-                print(f"⚠️ Skipped {filename} (error reading file: {e})")
-                continue
+def story_token_re(xml):
+    """Token regex for the prefix the part's root binds WordprocessingML to, or None if it binds none."""
+    root = ROOT_TAG_RE.search(xml)
+    prefixes = [m.group(1) for m in NS_DECL_RE.finditer(root.group(0) if root else "")
+                if (m.group(2) if m.group(2) is not None else m.group(3)) == W_NS]
+    if not prefixes or prefixes[0] is None:
+        return None
+    prefix = prefixes[0]
+    if prefix not in story_token_res:
+        story_token_res[prefix] = re.compile(STORY_TOKEN_PATTERN.format(w=re.escape(prefix)))
+    return story_token_res[prefix]
+
+def story_text(xml):
+    """Plain text of a story part, one line per paragraph, or None if its text can't be found in the raw XML.
+
+    Text split over several <w:t> runs is joined back together, so a match is
+    found wherever the paragraph text would contain it.
+    """
+    token_re = story_token_re(xml)
+    if token_re is None:
+        return None
+    chunks = []
+    for match in token_re.finditer(xml):
+        text, special = match.group(1), match.group(2)
+        if text is not None:
+            chunks.append(unescape(text))
+        elif special == "tab":
+            chunks.append("\t")
+        else:
+            chunks.append("\n")
+    return "".join(chunks)
 
-            replaced_in_file = False
+def might_contain_match(file_path):
+    """Cheap check on the raw story XML before the full python-docx load.
 
-            # Replace in paragraphs
-            for paragraph in doc.paragraphs:
-                if replace_text_in_paragraph(paragraph, pattern, replace_text):
+    Returns False only when no story part can contain a find term. Anything
+    unexpected (including a part that doesn't bind WordprocessingML to a
+    prefix) returns True so the normal load decides.
+    """
+    try:
+        with zipfile.ZipFile(file_path, 'r') as z:
+            for name in z.namelist():
+                if STORY_PART_RE.fullmatch(name):
+                    text = story_text(z.read(name).decode("utf-8"))
+                    if text is None or replacement_table.pattern.search(text):
+                        return True
+        return False
+    except Exception:
+        return True
+
+def replace_in_document(doc, filename, log, hits):
+    """Replace in body, headers, footers and tables. Returns True if anything changed."""
+    replaced_in_file = False
+
+    # Replace in paragraphs
+    for paragraph in doc.paragraphs:
+        if replace_text_in_paragraph(paragraph, replacement_table, hits):
+            replaced_in_file = True
+
+    # Replace in headers and footers
+    for section in doc.sections:
+        if section.header:
+            for para in section.header.paragraphs:
+                if replace_text_in_paragraph(para, replacement_table, hits):
+                    replaced_in_file = True
+
+            for table in section.header.tables:
+                try:
+                    if table._cells:
+                        for cell in table._cells:
+                            for para in cell.paragraphs:
+                                if replace_text_in_paragraph(para, replacement_table, hits):
+                                    replaced_in_file = True
+                except (IndexError, AttributeError):
+                    continue
+
+        if section.footer:
+            for para in section.footer.paragraphs:
+                if replace_text_in_paragraph(para, replacement_table, hits):
                     replaced_in_file = True
 
-            # Replace in headers and footers
-            for section in doc.sections:
-                if section.header:
-                    for para in section.header.paragraphs:
-                        if replace_text_in_paragraph(para, pattern, replace_text):
-                            replaced_in_file = True
-                    
-                    for table in section.header.tables:
-                        try:
-                            if table._cells:
-                                for cell in table._cells:
-                                    for para in cell.paragraphs:
-                                        if replace_text_in_paragraph(para, pattern, replace_text):
-                                            replaced_in_file = True
-                        except (IndexError, AttributeError):
-                            continue
-                
-                if section.footer:
-                    for para in section.footer.paragraphs:
-                        if replace_text_in_paragraph(para, pattern, replace_text):
-                            replaced_in_file = True
-                    
-                    for table in section.footer.tables:
-                        try:
-                            if table._cells:
-                                for cell in table._cells:
-                                    for para in cell.paragraphs:
-                                        if replace_text_in_paragraph(para, pattern, replace_text):
-                                            replaced_in_file = True
-                        except (IndexError, AttributeError):
-                            continue
-
-            # Replace in tables
-            for table in doc.tables:
+            for table in section.footer.tables:
                 try:
-                    if not table._cells:
-                        continue
-                    for cell in table._cells:
-                        for para in cell.paragraphs:
-                            if replace_text_in_paragraph(para, pattern, replace_text):
-                                replaced_in_file = True
-                except (IndexError, AttributeError) as e:
-                    print(f"⚠️ Skipped malformed table in {filename}: {e}")
+                    if table._cells:
+                        for cell in table._cells:
+                            for para in cell.paragraphs:
+                                if replace_text_in_paragraph(para, replacement_table, hits):
+                                    replaced_in_file = True
+                except (IndexError, AttributeError):
                     continue
 
+    # Replace in tables
+    for table in doc.tables:
+        try:
+            if not table._cells:
+                continue
+            for cell in table._cells:
+                for para in cell.paragraphs:
+                    if replace_text_in_paragraph(para, replacement_table, hits):
+                        replaced_in_file = True
+        except (IndexError, AttributeError) as e:
+            log.append(f"⚠️ Skipped malformed table in {filename}: {e}")
+            continue
+
+    return replaced_in_file
+
+def process_file(file_path, data=None):
+    """Replace in one .docx file.
+
+    Runs in a worker process, so status lines are returned instead of printed.
+    data is the file's content when the pipeline (batch_pipeline.py) has
+    already read it; the new content is then handed back instead of saved.
+    Returns ((log_lines, replaced, processed, hits_per_pair, timing_record), new_bytes or None).
+    """
+    log = []
+    hits = Counter()
+    filename = os.path.basename(file_path)
+    timer = FileTimer(file_path, profiler if profile_slowest else None)
+    buffered = data is not None
+
+    if not buffered and stream_above_mb is not None and os.path.getsize(file_path) > stream_above_mb * 1e6:
+        # Memory stays bounded by the largest paragraph; the scan also stands in for the prefilter
+        try:
+            changed = replace_in_docx(file_path, replacement_table, hits, timer)
+        except UnsupportedStory as e:
+            log.append(f"↪️ {filename}: can't stream ({e}), loading the whole document")
+        except Exception as e:
+            log.append(f"⚠️ Skipped {filename} (error reading file: {e})")
+            return (log, False, False, hits, timer.finish()), None
+        else:
+            log.append(f"✅ Modified: {file_path}" if changed else f"❌ No change: {file_path}")
+            return (log, changed > 0, True, hits, timer.finish()), None
+
+    if prefilter:
+        with timer.phase("prefilter"):
+            candidate = might_contain_match(BytesIO(data) if buffered else file_path)
+        if not candidate:
+            log.append(f"❌ No change: {file_path}")
+            return (log, False, True, hits, timer.finish()), None
+
+    try:
+        if buffered:
+            timer.bytes_read += len(data)
+        else:
+            data = timer.read_file(file_path)
+        with timer.phase("parse"):
+            doc = Document(BytesIO(data))
+    except Exception as e:
+        log.append(f"⚠️ Skipped {filename} (error reading file: {e})")
+        return (log, False, False, hits, timer.finish()), None
+
+    with timer.phase("replace"):
+        replaced_in_file = replace_in_document(doc, filename, log, hits)
+
+    output = None
+    if replaced_in_file:
+        # Only parts whose bytes changed are compressed again; images etc. are copied as they are
+        with timer.phase("serialize"):
+            entries = docx_entries(doc)
+        # Replacements that give back the same text leave every part as it was: nothing is written
+        if buffered:
+            with timer.phase("pack"):
+                output = entries_to_bytes(data, entries)
+            replaced_in_file = output is not None
+            timer.bytes_written += len(output or b"")
+        else:
+            with timer.phase("write"):
+                replaced_in_file = write_entries(file_path, entries, file_path)
             if replaced_in_file:
-                doc.save(file_path)
-                count_replaced += 1
-                print(f"✅ Modified: {file_path}")
+                timer.bytes_written += os.path.getsize(file_path)
+
+    if replaced_in_file:
+        log.append(f"✅ Modified: {file_path}")
+    else:
+        log.append(f"❌ No change: {file_path}")
+
+    return (log, replaced_in_file, True, hits, timer.finish()), output
+
+def io_error_result(file_path, error):
+    """process_file()-style result for a file that failed in the pipeline."""
+    return [f"⚠️ Skipped {os.path.basename(file_path)} (pipeline error: {error})"], False, False, Counter(), None
+
+def imap_ordered(executor, fn, items, window):
+    """Like executor.map, but pulls items lazily and keeps at most window tasks in flight.
+
+    Yields (item, result) in submission order.
+    """
+    pending = deque()
+    for item in items:
+        pending.append((item, executor.submit(fn, item)))
+        if len(pending) >= window:
+            item, future = pending.popleft()
+            yield item, future.result()
+    while pending:
+        item, future = pending.popleft()
+        yield item, future.result()
+
+def main():
+    print(sys.executable)
+
+    count_files = 0
+    count_replaced = 0
+    count_converted = 0
+    count_unchanged = 0
+    count_not_candidate = 0
+    pair_hits = Counter()
+    run_timer = RunTimer(timing_log, profile_slowest, profiler)
+
+    manifest = None
+    if use_manifest:
+        manifest = Manifest(root_folder, "replace_docx", {"pairs": replacement_pairs})
+
+    candidates = None
+    if use_index:
+        # Bring the index up to date (only changed files are read), then ask it for candidates
+        with TextIndex(root_folder, (".docx",)) as index:
+            counts = index.update(workers)
+            print(f"🗂️ Index: {counts['indexed']} files (re)indexed, {counts['unchanged']} unchanged.")
+            candidates = index.candidates(find for find, replace in replacement_pairs)
+
+    legacy_files = []
+
+    def pending_files():
+        """.docx files as they are discovered, minus those the manifest says are done
+        and those the index says contain no find term.
+
+        .doc files are set aside and converted together once discovery is over.
+        """
+        nonlocal count_unchanged, count_not_candidate
+        for file_path in iter_files(root_folder, (".docx", ".doc")):
+            if manifest and manifest.is_done(file_path):
+                count_unchanged += 1
+            elif file_path.lower().endswith(".doc"):
+                legacy_files.append(file_path)
+            elif candidates is not None and path_key(file_path) not in candidates:
+                count_not_candidate += 1
             else:
-                print(f"❌ No change: {file_path}")
+                yield file_path
+
+    def run(file_paths):
+        if pipeline:
+            # Files above stream_above_mb are not read ahead; the worker streams them itself
+            buffer_limit = memory_budget_mb if stream_above_mb is None else min(memory_budget_mb, stream_above_mb)
+            results = run_pipeline(file_paths, process_file, executor, io_threads, memory_budget_mb,
+                                   buffer_limit, window=workers * 4 + io_threads)
+            return ((file_path, result if error is None else io_error_result(file_path, error))
+                    for file_path, result, error in results)
+        if executor is not None:
+            # Results come back in submission order, so the output is the same as a serial run
+            results = imap_ordered(executor, process_file, file_paths, window=workers * 4)
+        else:
+            results = ((file_path, process_file(file_path)) for file_path in file_paths)
+        return ((file_path, result) for file_path, (result, output) in results)
+
+    def report(results, sources):
+        """Print and count results; sources maps a converted .docx back to its .doc"""
+        nonlocal count_files, count_replaced
+        for file_path, (log, replaced, processed, hits, timing) in results:
+            for line in log:
+                print(line)
+            if timing:
+                run_timer.add(timing)
+            count_replaced += replaced
+            count_files += processed
+            pair_hits.update(hits)
+            if processed and manifest:
+                manifest.record(sources.get(file_path, file_path))
+
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        report(run(pending_files()), {})
+
+        if legacy_files:
+            print(f"🔄 Converting {len(legacy_files)} .doc files to .docx...")
+            with BatchConverter("docx", instances=converter_instances) as converter:
+                conversions = converter.convert(legacy_files)
+
+            sources = {}
+            for result in conversions:
+                output = result.output or convert_doc_with_word(result.source)
+                if output:
+                    sources[output] = result.source
+                    count_converted += 1
+                    print(f"✅ Converted: {output}")
+                else:
+                    print(f"⚠️ Could not convert {os.path.basename(result.source)} "
+                          f"({result.status}: {result.detail}). Skipping.")
+            report(run(list(sources)), sources)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if manifest:
+            manifest.close()
 
-            count_files += 1
+    print(f"✅ Processed {count_files} Word files (including subfolders).")
+    print(f"⏭️ Skipped {count_unchanged} files unchanged since the last run.")
+    if use_index:
+        print(f"⏭️ Skipped {count_not_candidate} files the index shows contain no find term.")
+    print(f"🔄 Converted {count_converted} .doc files to .docx.")
+    if replacements_file:
+        print(f"📝 Updated {count_replaced} files using {len(replacement_table.replacements)} pairs from '{replacements_file}'.")
+        for find, hits in pair_hits.most_common():
+            print(f"   {hits:>6} × '{find}'")
+    else:
+        print(f"📝 Updated {count_replaced} files containing '{find_text}'.")
+    if timing_log or profile_slowest:
+        run_timer.summary()
+    print("Done!")
 
-print(f"✅ Processed {count_files} Word files (including subfolders).")
-print(f"🔄 Converted {count_converted} .doc files to .docx.")
-print(f"📝 Updated {count_replaced} files containing '{find_text}'.")
-print("Done!")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
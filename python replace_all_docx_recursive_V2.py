@@ -7,15 +7,23 @@ Preserves lists, numbering, bullets, and heading styles.
 from docx import Document
 from docx.shared import Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.enum.style import WD_STYLE_TYPE
+from docx.oxml.ns import qn
 import os
 from pathlib import Path
 import shutil
+from file_discovery import iter_files
+from ooxml_package import save_docx
 
 class DocxFormatter:
+    # rPr attributes for bold/italic = True / False; None removes the element
+    _TOGGLE_ATTRS = {True: {qn('w:val'): None}, False: {qn('w:val'): '0'}, None: None}
+    
     def __init__(self, template_path):
         """Initialize with template document path"""
         self.template = Document(template_path)
         self.styles = self._extract_styles()
+        self._patches = {key: self._rpr_patch(fmt) for key, fmt in self.styles.items()}
         
     def _extract_styles(self):
         """Extract font and paragraph styles from template"""
@@ -66,39 +74,103 @@ class DocxFormatter:
         if format_dict.get('color'):
             run.font.color.rgb = format_dict['color']
     
+    def _classify_style(self, style_name):
+        """Map a paragraph style name to (target format key, is heading)"""
+        style_name = style_name.lower().replace(' ', '')
+        for key in ('heading1', 'heading2', 'heading3'):
+            if key in style_name:
+                return key, True
+        return 'normal', False
+    
+    def _style_targets(self, doc):
+        """Build the style-id -> target table for a document (once per document)"""
+        targets = {}
+        default_target = ('normal', False)
+        for style in doc.styles.element.style_lst:
+            if style.type != WD_STYLE_TYPE.PARAGRAPH:
+                continue
+            target = self._classify_style(style.name_val or '')
+            targets[style.styleId] = target
+            if style.default:
+                default_target = target
+        return targets, default_target
+    
+    def _rpr_patch(self, format_dict):
+        """Precompute the rPr changes (font, size, color) a template format makes"""
+        patch = []
+        if format_dict.get('font_name'):
+            name = format_dict['font_name']
+            patch.append(('rFonts', {qn('w:ascii'): name, qn('w:hAnsi'): name}))
+        if format_dict.get('font_size'):
+            patch.append(('sz', {qn('w:val'): str(int(format_dict['font_size'].pt * 2))}))
+        if format_dict.get('color'):
+            patch.append(('color', {qn('w:val'): str(format_dict['color']), qn('w:themeColor'): None}))
+        return patch
+    
+    @staticmethod
+    def _on_off(rPr, tag):
+        """Read a bold/italic toggle from a run's rPr (True, False or None)"""
+        element = rPr.find(qn(f'w:{tag}')) if rPr is not None else None
+        if element is None:
+            return None
+        return element.get(qn('w:val')) not in ('0', 'false', 'off')
+    
+    @staticmethod
+    def _patch_matches(rPr, patch):
+        """True if the run already has every value in the patch"""
+        for tag, attrs in patch:
+            element = rPr.find(qn(f'w:{tag}')) if rPr is not None else None
+            if attrs is None:
+                if element is not None:
+                    return False
+                continue
+            if element is None:
+                return False
+            for key, value in attrs.items():
+                if element.get(key) != value:
+                    return False
+        return True
+    
+    def _apply_patch(self, r, patch):
+        """Apply an rPr patch to a run element. Runs that already match are left alone."""
+        if self._patch_matches(r.rPr, patch):
+            return False
+        rPr = r.get_or_add_rPr()
+        for tag, attrs in patch:
+            if attrs is None:
+                getattr(rPr, f'_remove_{tag}')()
+                continue
+            element = getattr(rPr, f'get_or_add_{tag}')()
+            for key, value in attrs.items():
+                if value is None:
+                    element.attrib.pop(key, None)
+                else:
+                    element.set(key, value)
+        return True
+    
     def format_document(self, input_path, output_path):
         """Apply template formatting to a document"""
         doc = Document(input_path)
+        style_targets, default_target = self._style_targets(doc)
         
-        for para in doc.paragraphs:
+        for p in doc.element.body.p_lst:
             # Determine which style to apply
-            style_name = para.style.name.lower().replace(' ', '')
-            
-            if 'heading1' in style_name or 'heading 1' in style_name:
-                target_style = self.styles['heading1']
-            elif 'heading2' in style_name or 'heading 2' in style_name:
-                target_style = self.styles['heading2']
-            elif 'heading3' in style_name or 'heading 3' in style_name:
-                target_style = self.styles['heading3']
-            else:
-                target_style = self.styles['normal']
+            key, is_heading = style_targets.get(p.style, default_target)
+            target_style = self.styles[key]
+            patch = self._patches[key]
             
             # Apply formatting to all runs in paragraph
-            for run in para.runs:
-                # Preserve original bold/italic if they exist
-                original_bold = run.font.bold
-                original_italic = run.font.italic
-                
-                self._apply_run_format(run, target_style)
-                
-                # Restore original emphasis if it was set
-                if original_bold is not None:
-                    run.font.bold = original_bold
-                if original_italic is not None:
-                    run.font.italic = original_italic
+            for r in p.r_lst:
+                # Preserve original bold/italic if they exist, otherwise take the template's
+                emphasis = [
+                    (tag, self._TOGGLE_ATTRS[target_style[prop]])
+                    for tag, prop in (('b', 'bold'), ('i', 'italic'))
+                    if target_style.get(prop) is not None and self._on_off(r.rPr, tag) is None
+                ]
+                self._apply_patch(r, patch + emphasis)
         
-        # Save formatted document
-        doc.save(output_path)
+        # Save formatted document (unchanged images etc. are copied, not recompressed)
+        save_docx(doc, input_path, output_path)
         print(f"✓ Formatted: {os.path.basename(input_path)} -> {os.path.basename(output_path)}")
     
     def batch_format(self, input_folder, output_folder=None):
@@ -113,11 +185,8 @@ class DocxFormatter:
         
         output_folder.mkdir(exist_ok=True)
         
-        # Find all DOCX files
-        docx_files = list(input_path.glob("*.docx"))
-        
-        # Filter out temporary files
-        docx_files = [f for f in docx_files if not f.name.startswith('~$')]
+        # Find all DOCX files (one folder only; temp files are left out)
+        docx_files = [Path(path) for path in iter_files(input_folder, (".docx",), recursive=False)]
         
         if not docx_files:
             print(f"No DOCX files found in {input_folder}")
@@ -2,9 +2,19 @@ import os
 from openpyxl import load_workbook
 import sys
 import re
-import subprocess
-import tempfile
 import shutil
+import zipfile
+from io import BytesIO
+from collections import Counter
+from html import unescape
+from xml.sax.saxutils import escape
+from batch_manifest import Manifest
+from file_discovery import iter_files
+from file_timing import RunTimer
+from office_convert import BatchConverter
+from ooxml_package import rewrite_package, write_entries, xlsx_entries
+from text_index import TextIndex, path_key
+from text_replace import ReplacementTable, load_replacements
 
 print(sys.executable)
 
@@ -12,29 +22,26 @@ print(sys.executable)
 root_folder = r"C:\Users\judep\Downloads\FORMS EDITING\1. Accounting Forms"  # Folder containing Excel files
 find_text = "Belships"
 replace_text = "GMSMI"
+replacements_file = None  # Optional .csv/.json table of find → replace pairs (used instead of find_text/replace_text)
 match_variations = True  # If True, finds case-insensitive and whitespace variations
+shared_strings_mode = True  # If True, edits xl/sharedStrings.xml and inline strings directly instead of loading the workbook
+converter_instances = 2  # LibreOffice runs converting .xls/.xlsm files side by side, in batches (each with its own profile)
+use_manifest = True  # If True, skips files unchanged since their last successful run with the same settings
+use_index = False  # If True, only opens files the full-text index (text_index.py) lists as containing a find term
+timing_log = None  # JSON Lines file for per-file phase timings and bytes read/written (None = no log)
+profile_slowest = 0  # Profile every file and show the N slowest at the end (0 = off)
+profiler = "cprofile"  # "cprofile" (where the time goes) or "tracemalloc" (where the memory goes)
 
 # --- Do not edit below this line ---
 count_files = 0
 count_replaced = 0
 count_converted = 0
+count_unchanged = 0
+count_not_candidate = 0
+run_timer = RunTimer(timing_log, profile_slowest, profiler)
 
-def convert_xls_to_xlsx(xls_path):
-    """Convert .xls or .xlsm to .xlsx using LibreOffice or Excel COM."""
-    try:
-        # Try LibreOffice first
-        xlsx_path = xls_path.rsplit(".", 1)[0] + ".xlsx"
-        subprocess.run([
-            "soffice", "--headless", "--convert-to", "xlsx", "--outdir",
-            os.path.dirname(xls_path), xls_path
-        ], capture_output=True, timeout=30)
-        
-        if os.path.exists(xlsx_path):
-            return xlsx_path
-    except Exception:
-        pass
-    
-    # Try Excel COM (Windows only)
+def convert_with_excel(xls_path):
+    """Convert .xls or .xlsm to .xlsx using Excel COM, for files LibreOffice could not convert."""
     try:
         import win32com.client
         excel = win32com.client.Dispatch("Excel.Application")
@@ -50,79 +57,232 @@ def convert_xls_to_xlsx(xls_path):
     
     return None
 
-def create_variation_pattern(text):
-    """Create a regex pattern that matches variations of the text."""
-    # Escape special regex characters
-    escaped = re.escape(text)
-    # Allow optional whitespace variations (spaces, tabs, etc.)
-    pattern = re.sub(r'\\s+', r'\\s+', escaped)
-    # Make it case-insensitive
-    return re.compile(pattern, re.IGNORECASE)
-
-for foldername, subfolders, filenames in os.walk(root_folder):
-    for filename in filenames:
-        # Skip temporary Excel files
-        if filename.startswith("~$"):
-            continue
-        
-        # Process .xlsx, .xls, and .xlsm files
-        if filename.endswith((".xlsx", ".xls", ".xlsm")):
-            file_path = os.path.join(foldername, filename)
-            
-            # Convert old formats to xlsx
-            if filename.endswith((".xls", ".xlsm")) and not filename.endswith(".xlsx"):
-                print(f"🔄 Converting {filename} to .xlsx...")
-                converted_path = convert_xls_to_xlsx(file_path)
-                if converted_path and os.path.exists(converted_path):
-                    file_path = converted_path
-                    count_converted += 1
-                    print(f"✅ Converted: {converted_path}")
-                else:
-                    print(f"⚠️ Could not convert {filename}. Skipping.")
+# Compile every find term into one matcher
+if replacements_file:
+    replacement_pairs = load_replacements(replacements_file)
+else:
+    replacement_pairs = [(find_text, replace_text)]
+replacement_table = ReplacementTable(replacement_pairs, ignore_case=match_variations,
+                                     whitespace_variations=match_variations)
+pair_hits = Counter()
+
+SHARED_STRINGS_PART = "xl/sharedStrings.xml"
+
+# <si> items in sharedStrings.xml, <is> inline strings in sheets, and the <t> text inside them
+SI_RE = re.compile(r"<((?:\w+:)?)si>(.*?)</\1si>", re.S)
+IS_RE = re.compile(r"<((?:\w+:)?)is>(.*?)</\1is>", re.S)
+T_RE = re.compile(r"<((?:\w+:)?)t(?:\s[^>]*)?(?:/>|>(.*?)</\1t>)", re.S)
+# Phonetic runs also hold <t> elements but are not part of the cell text
+RPH_RE = re.compile(r"<((?:\w+:)?)rPh\b.*?</\1rPh>", re.S)
+
+def replace_in_text(text):
+    """Apply every replacement pair to one string. Returns the new string, or None if nothing matched."""
+    if not replacement_table.pattern.search(text):
+        return None
+    new_text = replacement_table.sub(text, pair_hits)
+    return new_text if new_text != text else None
+
+def replace_in_string_items(xml, item_re, item_tag):
+    """Run the replacement once per <si>/<is> string item in xml.
+
+    A matching item is rewritten as a single plain <t>, the same way a
+    workbook save writes back a cell whose value was changed.
+    Returns the new xml, or None if no item matched.
+    """
+    changed = False
+
+    def replace_item(match):
+        nonlocal changed
+        prefix, body = match.group(1), match.group(2)
+        text = "".join(unescape(t.group(2) or "") for t in T_RE.finditer(RPH_RE.sub("", body)))
+        new_text = replace_in_text(text)
+        if new_text is None:
+            return match.group(0)
+        changed = True
+        tag = prefix + item_tag
+        return f'<{tag}><{prefix}t xml:space="preserve">{escape(new_text)}</{prefix}t></{tag}>'
+
+    new_xml = item_re.sub(replace_item, xml)
+    return new_xml if changed else None
+
+def replace_in_package(file_path, timer):
+    """Replace in the shared string table and inline strings without loading the workbook.
+
+    Only sharedStrings.xml and sheets with a changed inline string are rewritten;
+    every other part is copied byte-for-byte. Returns True if the file changed.
+    """
+    replaced_parts = {}
+    temp_path = file_path + ".tmp"
+    try:
+        with zipfile.ZipFile(file_path, 'r') as zin:
+            if SHARED_STRINGS_PART in zin.NameToInfo:
+                with timer.phase("unzip"):
+                    xml = zin.read(SHARED_STRINGS_PART).decode("utf-8")
+                with timer.phase("regex"):
+                    new_xml = replace_in_string_items(xml, SI_RE, "si")
+                if new_xml is not None:
+                    replaced_parts[SHARED_STRINGS_PART] = new_xml.encode("utf-8")
+
+            for name in zin.NameToInfo:
+                if not (name.startswith("xl/worksheets/") and name.endswith(".xml")):
                     continue
-            
-            try:
-                wb = load_workbook(file_path)
-            except Exception as e:
-                print(f"⚠️ Skipped {filename} (error reading file: {e})")
-                continue
-
-            replaced_in_file = False
-            
-            # Create pattern for text variations if enabled
-            if match_variations:
-                pattern = create_variation_pattern(find_text)
-            else:
-                pattern = None
-
-            # Loop through all sheets and cells
-            for sheet in wb.worksheets:
-                for row in sheet.iter_rows():
-                    for cell in row:
-                        if isinstance(cell.value, str):
-                            if pattern:
-                                # Use regex to match variations
-                                if re.search(pattern, cell.value):
-                                    cell.value = re.sub(pattern, replace_text, cell.value)
-                                    replaced_in_file = True
-                            else:
-                                # Exact match
-                                if find_text in cell.value:
-                                    cell.value = cell.value.replace(find_text, replace_text)
-                                    replaced_in_file = True
-
-            if replaced_in_file:
-                wb.save(file_path)
+                with timer.phase("unzip"):
+                    xml = zin.read(name).decode("utf-8")
+                if "inlineStr" not in xml:
+                    continue
+                with timer.phase("regex"):
+                    new_xml = replace_in_string_items(xml, IS_RE, "is")
+                if new_xml is not None:
+                    replaced_parts[name] = new_xml.encode("utf-8")
+
+            timer.bytes_read += os.path.getsize(file_path)
+            if not replaced_parts:
+                return False
+            with timer.phase("write"):
+                rewrite_package(zin, temp_path, replaced_parts)
+
+        os.replace(temp_path, file_path)
+        timer.bytes_written += os.path.getsize(file_path)
+        return True
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+manifest = None
+if use_manifest:
+    manifest = Manifest(root_folder, "replace_xlsx", {
+        "pairs": replacement_pairs,
+        "match_variations": match_variations,
+        "shared_strings_mode": shared_strings_mode,
+    })
+
+def process_workbook(file_path):
+    """Replace in one .xlsx file and print the outcome, timing its phases.
+
+    Returns True if the file was processed (changed or not), False on error.
+    """
+    timer = run_timer.start(file_path)
+    try:
+        return replace_in_workbook(file_path, timer)
+    finally:
+        run_timer.add(timer.finish())
+
+def replace_in_workbook(file_path, timer):
+    global count_files, count_replaced
+    filename = os.path.basename(file_path)
+
+    if shared_strings_mode:
+        try:
+            if replace_in_package(file_path, timer):
                 count_replaced += 1
                 print(f"✅ Modified: {file_path}")
             else:
                 print(f"— No change: {file_path}")
+        except Exception as e:
+            print(f"⚠️ Skipped {filename} (error reading file: {e})")
+            return False
+        count_files += 1
+        return True
+
+    try:
+        data = timer.read_file(file_path)
+        with timer.phase("parse"):
+            wb = load_workbook(BytesIO(data))
+    except Exception as e:
+        print(f"⚠️ Skipped {filename} (error reading file: {e})")
+        return False
+
+    replaced_in_file = False
+
+    # Loop through all sheets and cells
+    with timer.phase("replace"):
+        for sheet in wb.worksheets:
+            for row in sheet.iter_rows():
+                for cell in row:
+                    if isinstance(cell.value, str):
+                        new_value = replace_in_text(cell.value)
+                        if new_value is not None:
+                            cell.value = new_value
+                            replaced_in_file = True
+
+    if replaced_in_file:
+        # Only parts whose bytes changed are compressed again; images etc. are copied as they are
+        with timer.phase("serialize"):
+            entries = xlsx_entries(wb)
+        with timer.phase("write"):
+            replaced_in_file = write_entries(file_path, entries, file_path)
+
+    if replaced_in_file:
+        timer.bytes_written += os.path.getsize(file_path)
+        count_replaced += 1
+        print(f"✅ Modified: {file_path}")
+    else:
+        print(f"— No change: {file_path}")
+
+    count_files += 1
+    return True
+
+candidates = None
+if use_index:
+    # Bring the index up to date (only changed files are read), then ask it for candidates
+    # (one process: this script has no __main__ guard for worker processes to import)
+    with TextIndex(root_folder, (".xlsx",)) as index:
+        counts = index.update(workers=1)
+        print(f"🗂️ Index: {counts['indexed']} files (re)indexed, {counts['unchanged']} unchanged.")
+        candidates = index.candidates(find for find, replace in replacement_pairs)
+
+legacy_files = []
+for file_path in iter_files(root_folder, (".xlsx", ".xls", ".xlsm")):
+    if manifest and manifest.is_done(file_path):
+        count_unchanged += 1
+        continue
+    
+    # Old formats are converted together once the whole tree has been seen
+    if not file_path.lower().endswith(".xlsx"):
+        legacy_files.append(file_path)
+        continue
+    
+    if candidates is not None and path_key(file_path) not in candidates:
+        count_not_candidate += 1
+        continue
+    
+    if process_workbook(file_path) and manifest:
+        manifest.record(file_path)
+
+# Convert old formats to xlsx in batches of files per LibreOffice run
+if legacy_files:
+    print(f"🔄 Converting {len(legacy_files)} old Excel files to .xlsx...")
+    with BatchConverter("xlsx", instances=converter_instances) as converter:
+        conversions = converter.convert(legacy_files)
+    
+    for result in conversions:
+        converted_path = result.output or convert_with_excel(result.source)
+        if converted_path and os.path.exists(converted_path):
+            count_converted += 1
+            print(f"✅ Converted: {converted_path}")
+        else:
+            print(f"⚠️ Could not convert {os.path.basename(result.source)} "
+                  f"({result.status}: {result.detail}). Skipping.")
+            continue
+        if process_workbook(converted_path) and manifest:
+            manifest.record(result.source)
 
-            count_files += 1
+if manifest:
+    manifest.close()
 
 print(f"\n✅ Processed {count_files} Excel files (including subfolders).")
+print(f"⏭️ Skipped {count_unchanged} files unchanged since the last run.")
+if use_index:
+    print(f"⏭️ Skipped {count_not_candidate} files the index shows contain no find term.")
 print(f"🔄 Converted {count_converted} old Excel files to .xlsx.")
-print(f"📝 Updated {count_replaced} files containing '{find_text}'.")
+if replacements_file:
+    print(f"📝 Updated {count_replaced} files using {len(replacement_table.replacements)} pairs from '{replacements_file}'.")
+    for find, hits in pair_hits.most_common():
+        print(f"   {hits:>6} × '{find}'")
+else:
+    print(f"📝 Updated {count_replaced} files containing '{find_text}'.")
 if match_variations:
     print(f"   (Found text variations: case-insensitive + whitespace variations)")
+if timing_log or profile_slowest:
+    run_timer.summary()
 print("🎉 Done!")
@@ -0,0 +1,131 @@
+"""
+Search All (read-only)
+Reports which .docx, .xlsx/.xlsm and .pdf files contain the search terms,
+where (paragraph/header/table, sheet!cell, page) and with some surrounding
+text. Files are only read, never written - run this before a replace job to
+see what it would touch.
+"""
+
+import csv
+import os
+import sys
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from file_discovery import iter_files
+from text_extract import EXTRACTORS, extract_texts
+from text_index import TextIndex
+from text_replace import ReplacementTable, load_replacements
+
+# SETTINGS – edit these before running
+root_folder = r"C:\Users\judep\Downloads\FORMS EDITING"
+search_terms = ["Belships", "VEM FORMS REMOVED FOR MANUAL REVISION"]
+replacements_file = None  # Optional .csv/.json find → replace table; its find column is searched instead
+match_variations = True  # If True, finds case-insensitive and whitespace variations
+extensions = tuple(EXTRACTORS)  # File types to search
+context_chars = 40  # Characters of context shown on each side of a match
+workers = os.cpu_count() or 1  # Number of worker processes (1 = search files one by one)
+report_file = None  # Optional CSV report path (keep it outside root_folder)
+use_index = False  # Answer from the full-text index (text_index.py), updating it first
+
+# --- Do not edit below this line ---
+
+if replacements_file:
+    search_terms = [find for find, replace in load_replacements(replacements_file)]
+search_table = ReplacementTable([(term, term) for term in search_terms], ignore_case=match_variations,
+                                whitespace_variations=match_variations)
+
+def find_matches(texts, matches):
+    """Append (location, term, context) to matches for every match in (location, text) pairs."""
+    for location, text in texts:
+        for match in search_table.pattern.finditer(text):
+            pair = search_table.lookup(match.group(0))
+            if pair is None:
+                continue
+            term = pair[0]
+            start = max(match.start() - context_chars, 0)
+            context = text[start:match.end() + context_chars]
+            context = " ".join(context.split())  # one line, however the text was broken
+            matches.append((location, term, context))
+
+def search_file(file_path):
+    """Returns (file_path, matches, error): matches as (location, term, context), error message or None."""
+    matches = []
+    try:
+        find_matches(extract_texts(file_path), matches)
+    except Exception as e:
+        return file_path, matches, str(e)
+    return file_path, matches, None
+
+def search_index():
+    """Same results as searching the files, from the index: (file_path, matches, None) per file."""
+    with TextIndex(root_folder, extensions) as index:
+        counts = index.update(workers)
+        print(f"🗂️ Index: {counts['indexed']} files (re)indexed, {counts['unchanged']} unchanged.")
+        texts = {}
+        for term in search_terms:
+            for file_path, location, text in index.search(term):
+                texts.setdefault(file_path, {})[location] = text
+
+    for file_path in sorted(texts):
+        matches = []
+        find_matches(texts[file_path].items(), matches)
+        yield file_path, matches, None
+
+def main():
+    print(sys.executable)
+
+    count_files = 0
+    count_matched = 0
+    count_errors = 0
+    term_hits = Counter()
+    report_rows = []
+
+    file_paths = iter_files(root_folder, extensions)
+    if use_index:
+        executor = None
+        results = search_index()
+    elif workers > 1:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(search_file, file_paths, chunksize=8)
+    else:
+        executor = None
+        results = map(search_file, file_paths)
+
+    try:
+        for file_path, matches, error in results:
+            count_files += 1
+            if error:
+                count_errors += 1
+                print(f"⚠️ Could not read {file_path}: {error}")
+            if not matches:
+                continue
+
+            count_matched += 1
+            print(f"\n📄 {file_path}")
+            for location, term, context in matches:
+                term_hits[term] += 1
+                print(f"   {location}: '{term}' … {context} …")
+                report_rows.append((file_path, location, term, context))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    if report_file:
+        with open(report_file, "w", newline="", encoding="utf-8-sig") as f:
+            writer = csv.writer(f)
+            writer.writerow(["file", "location", "term", "context"])
+            writer.writerows(report_rows)
+
+    if not use_index:  # the index only returns files with a match
+        print(f"\n🔍 Searched {count_files} files (including subfolders).")
+    print(f"📄 {count_matched} files contain at least one term.")
+    if count_errors:
+        print(f"⚠️ {count_errors} files could not be read.")
+    for term, hits in term_hits.most_common():
+        print(f"   {hits:>6} × '{term}'")
+    if report_file:
+        print(f"📝 Report saved to: {report_file}")
+    print("Done!")
+
+if __name__ == "__main__":
+    main()
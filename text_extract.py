@@ -0,0 +1,110 @@
+"""
+Text Extract
+Read-only text extraction for DOCX, XLSX and PDF files, as (location, text)
+pairs. DOCX story parts are streamed straight from the ZIP with iterparse,
+workbooks are opened with openpyxl in read-only mode and PDFs are read page
+by page, so no document model is built and nothing is ever written.
+"""
+
+import os
+import re
+import zipfile
+import xml.etree.ElementTree as ET
+import fitz  # PyMuPDF
+from openpyxl import load_workbook
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Story parts: body (incl. tables), headers, footers, footnotes and endnotes
+DOCX_STORY_RE = re.compile(r"word/(document|header\d*|footer\d*|footnotes|endnotes)\.xml")
+
+
+def _story_order(name):
+    """document.xml first, then the other stories by name (header2 before header10)"""
+    story = DOCX_STORY_RE.fullmatch(name).group(1)
+    digits = re.search(r"\d+$", story)
+    return (story != "document", story.rstrip("0123456789"), int(digits.group()) if digits else 0)
+
+
+def docx_texts(path):
+    """Yield (location, paragraph text) for every non-empty paragraph of a .docx.
+
+    Locations look like "body ¶12", "body table 2 ¶3" or "header1 ¶1".
+    """
+    with zipfile.ZipFile(path, 'r') as z:
+        stories = sorted((name for name in z.namelist() if DOCX_STORY_RE.fullmatch(name)),
+                         key=_story_order)
+        for name in stories:
+            story = DOCX_STORY_RE.fullmatch(name).group(1)
+            story = "body" if story == "document" else story
+            with z.open(name) as f:
+                yield from _story_paragraphs(f, story)
+
+
+def _story_paragraphs(f, story):
+    buffers = []  # text of each open paragraph (text boxes nest paragraphs)
+    table_depth = 0
+    table_number = 0
+    paragraph_number = 0
+
+    for event, elem in ET.iterparse(f, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == W + "p":
+                buffers.append([])
+            elif tag == W + "tbl":
+                table_depth += 1
+                if table_depth == 1:
+                    table_number += 1
+            continue
+
+        if tag == W + "t" and buffers:
+            buffers[-1].append(elem.text or "")
+        elif tag == W + "tab" and buffers:
+            buffers[-1].append("\t")
+        elif tag in (W + "br", W + "cr") and buffers:
+            buffers[-1].append("\n")
+        elif tag == W + "tbl":
+            table_depth -= 1
+        elif tag == W + "p":
+            paragraph_number += 1
+            text = "".join(buffers.pop())
+            if text.strip():
+                where = f"{story} table {table_number}" if table_depth else story
+                yield f"{where} ¶{paragraph_number}", text
+            elem.clear()  # drop the paragraph's subtree, keeping memory flat
+
+
+def xlsx_texts(path):
+    """Yield ("Sheet!A1", text) for every text cell of a workbook (read-only mode)."""
+    wb = load_workbook(path, read_only=True)
+    try:
+        for ws in wb.worksheets:
+            for row in ws.iter_rows():
+                for cell in row:
+                    if isinstance(cell.value, str):
+                        yield f"{ws.title}!{cell.coordinate}", cell.value
+    finally:
+        wb.close()
+
+
+def pdf_texts(path):
+    """Yield ("page N", page text) for every page of a PDF."""
+    with fitz.open(path) as doc:
+        for page_num, page in enumerate(doc, start=1):
+            text = page.get_text()
+            if text.strip():
+                yield f"page {page_num}", text
+
+
+EXTRACTORS = {
+    ".docx": docx_texts,
+    ".xlsx": xlsx_texts,
+    ".xlsm": xlsx_texts,
+    ".pdf": pdf_texts,
+}
+
+
+def extract_texts(path):
+    """(location, text) pairs of any supported file, picked by extension."""
+    return EXTRACTORS[os.path.splitext(path)[1].lower()](path)
@@ -0,0 +1,180 @@
+"""
+Text Index
+On-disk full-text index (SQLite FTS5, trigram tokenizer) of the text of
+every .docx, .xlsx/.xlsm and .pdf file under a root folder. Updates are
+incremental: only files whose size/mtime (and then content hash) changed
+are extracted again. Answers "which files mention X?" in milliseconds and
+gives the replace scripts their candidate file lists.
+"""
+
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from batch_manifest import file_hash
+from file_discovery import iter_files
+from text_extract import EXTRACTORS, extract_texts
+
+INDEX_NAME = ".text_index.sqlite"
+
+
+def path_key(path):
+    """Form of a path used to compare against candidates()"""
+    return os.path.normcase(os.path.normpath(path))
+
+
+def normalize(text):
+    """Collapse whitespace runs to one space, the same way for indexed text and queries"""
+    return " ".join(text.split())
+
+
+def _extract(path):
+    """(path, [(location, normalized text)], error or None); runs in a worker process"""
+    try:
+        return path, [(location, normalize(text)) for location, text in extract_texts(path)], None
+    except Exception as e:
+        return path, [], str(e)
+
+
+class TextIndex:
+    """Full-text index of one folder tree, stored as a SQLite file in its root.
+
+    The trigram tokenizer matches any substring of three or more characters,
+    case-insensitively, so a file is never missed because a term sits inside
+    a longer word. Text is stored with whitespace collapsed, so line breaks
+    and double spaces don't hide a match either. Paths are stored relative
+    to the root folder, like the batch manifest. Each file's texts are a
+    block of consecutive rowids noted in its files row, so replacing or
+    dropping them never scans the FTS table (path is not indexed there).
+    """
+
+    def __init__(self, root_folder, extensions=tuple(EXTRACTORS)):
+        """extensions limits which file types update() walks; entries of other types are kept."""
+        self.root_folder = root_folder
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.db = sqlite3.connect(os.path.join(root_folder, INDEX_NAME))
+        columns = [row[1] for row in self.db.execute("PRAGMA table_info(files)")]
+        if columns and "first_row" not in columns:
+            # Index from before rowid blocks: it is only a cache, so rebuild it
+            self.db.execute("DROP TABLE files")
+            self.db.execute("DROP TABLE IF EXISTS texts")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL, error TEXT,"
+            " first_row INTEGER NOT NULL, row_count INTEGER NOT NULL)"
+        )
+        self.db.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS texts"
+            " USING fts5(path UNINDEXED, location UNINDEXED, text, tokenize='trigram')"
+        )
+
+    def _key(self, path):
+        return os.path.relpath(path, self.root_folder)
+
+    def _path(self, key):
+        return os.path.join(self.root_folder, key)
+
+    def update(self, workers=os.cpu_count() or 1):
+        """Bring the index up to date with the folder tree.
+
+        Returns a dict of counts: indexed (new or changed), unchanged, removed, errors.
+        """
+        counts = {"indexed": 0, "unchanged": 0, "removed": 0, "errors": 0}
+        known = {row[0]: row[1:] for row in self.db.execute(
+            "SELECT path, size, mtime_ns, sha256, first_row, row_count FROM files")}
+        seen = set()
+        stale = {}
+
+        for path in iter_files(self.root_folder, self.extensions):
+            key = self._key(path)
+            seen.add(key)
+            stat = os.stat(path)
+            row = known.get(key)
+            if row and (stat.st_size, stat.st_mtime_ns) == row[:2]:
+                counts["unchanged"] += 1
+                continue
+            sha256 = file_hash(path)
+            if row and row[2] == sha256:
+                # Touched but not changed: just remember the new mtime
+                self.db.execute("UPDATE files SET size = ?, mtime_ns = ? WHERE path = ?",
+                                (stat.st_size, stat.st_mtime_ns, key))
+                counts["unchanged"] += 1
+                continue
+            stale[path] = (stat, sha256)
+
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                self._store(executor.map(_extract, stale, chunksize=4), stale, known, counts)
+        else:
+            self._store(map(_extract, stale), stale, known, counts)
+
+        for key in set(known) - seen:
+            if not key.lower().endswith(self.extensions):
+                continue  # another script's file types; not walked this time
+            self.db.execute("DELETE FROM files WHERE path = ?", (key,))
+            self._delete_texts(*known[key][3:])
+            counts["removed"] += 1
+
+        self.db.commit()
+        return counts
+
+    def _delete_texts(self, first_row, row_count):
+        if row_count:
+            self.db.execute("DELETE FROM texts WHERE rowid >= ? AND rowid < ?", (first_row, first_row + row_count))
+
+    def _store(self, results, stale, known, counts):
+        last = self.db.execute("SELECT rowid FROM texts ORDER BY rowid DESC LIMIT 1").fetchone()
+        next_row = last[0] + 1 if last else 1
+        for done, (path, texts, error) in enumerate(results, start=1):
+            key = self._key(path)
+            stat, sha256 = stale[path]
+            if key in known:
+                self._delete_texts(*known[key][3:])
+            self.db.executemany("INSERT INTO texts (rowid, path, location, text) VALUES (?, ?, ?, ?)",
+                                ((next_row + i, key, location, text) for i, (location, text) in enumerate(texts)))
+            self.db.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (key, stat.st_size, stat.st_mtime_ns, sha256, error, next_row, len(texts)))
+            next_row += len(texts)
+            counts["indexed"] += 1
+            counts["errors"] += error is not None
+            if done % 100 == 0:
+                self.db.commit()
+
+    def _where(self, term):
+        """WHERE clause and parameter matching texts that contain term"""
+        term = normalize(term)
+        if len(term) >= 3:
+            return "text MATCH ?", '"' + term.replace('"', '""') + '"'
+        # Too short for trigrams: LIKE still works, just without the index
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return "text LIKE ? ESCAPE '\\'", f"%{escaped}%"
+
+    def search(self, term):
+        """(path, location, text) of every indexed text containing term, in path order"""
+        where, param = self._where(term)
+        rows = self.db.execute(
+            f"SELECT path, location, text FROM texts WHERE {where} ORDER BY path, rowid", (param,))
+        return [(self._path(key), location, text) for key, location, text in rows]
+
+    def candidates(self, terms):
+        """Set of files (as path_key) that contain at least one of terms.
+
+        Files the index could not read are always included, since their
+        contents are unknown.
+        """
+        keys = {row[0] for row in self.db.execute("SELECT path FROM files WHERE error IS NOT NULL")}
+        for term in terms:
+            where, param = self._where(term)
+            keys.update(row[0] for row in self.db.execute(
+                f"SELECT DISTINCT path FROM texts WHERE {where}", (param,)))
+        return {path_key(self._path(key)) for key in keys}
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,188 @@
+"""
+Text Replace
+Find/replace engine shared by the replace scripts and the release pipeline:
+find → replace tables compiled into one single-pass matcher, and an in-place
+paragraph editor for DOCX that keeps run formatting.
+"""
+
+import csv
+import json
+import re
+from bisect import bisect_right
+from lxml import etree
+
+W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# Run content that makes up a paragraph's text, in document order
+TEXT_NODES = etree.XPath(
+    " | ".join(f"./{run}/w:{node}"
+               for run in ("w:r", "w:hyperlink/w:r", "w:ins/w:r", "w:smartTag/w:r", "w:fldSimple/w:r")
+               for node in ("t", "tab", "br", "cr")),
+    namespaces={"w": W[1:-1]},
+)
+# Tabs and breaks stand in the text as the characters paragraph.text, the
+# prefilter and the text index use, so terms don't match across them
+PLACEHOLDERS = {W + "tab": "\t", W + "br": "\n", W + "cr": "\n"}
+XML_SPACE = "{http://www.w3.org/XML/1998/namespace}space"
+
+
+def load_replacements(path):
+    """Read find → replace pairs from a .json or .csv file.
+
+    JSON: {"find": "replace", ...} or a list of [find, replace] / {"find": ..., "replace": ...}.
+    CSV: two columns, with an optional "find,replace" header row.
+    """
+    if path.lower().endswith(".json"):
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if isinstance(data, dict):
+            return list(data.items())
+        return [(item["find"], item["replace"]) if isinstance(item, dict) else tuple(item)
+                for item in data]
+
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        rows = [row for row in csv.reader(f) if len(row) >= 2]
+    if rows and [cell.strip().lower() for cell in rows[0][:2]] == ["find", "replace"]:
+        rows = rows[1:]
+    return [(row[0], row[1]) for row in rows]
+
+
+class ReplacementTable:
+    """Find → replace pairs compiled into one leftmost-longest matcher.
+
+    The find terms are merged into a trie-shaped regex, so each text is
+    scanned once no matter how many pairs there are. Where several terms
+    match at the same position, the longest one wins.
+    """
+
+    def __init__(self, pairs, ignore_case=True, whitespace_variations=False):
+        self.ignore_case = ignore_case
+        self.whitespace_variations = whitespace_variations
+        self.replacements = {}
+        for find, replace in pairs:
+            if find:
+                self.replacements.setdefault(self.key(find), (find, replace))
+        self.pattern = re.compile(self._trie_regex(), re.IGNORECASE if ignore_case else 0)
+
+    def key(self, text):
+        """Normalize a find term or matched text to its lookup key."""
+        if self.whitespace_variations:
+            text = re.sub(r"\s+", " ", text)
+        return text.casefold() if self.ignore_case else text
+
+    def _trie_regex(self):
+        # Branches are keyed by the case-folded character but match the term's own
+        # character: IGNORECASE folds one character at a time, while a folded key
+        # can be longer ("İ" folds to "i̇")
+        trie = {}
+        for find, replace in self.replacements.values():
+            if self.whitespace_variations:
+                find = re.sub(r"\s+", " ", find)
+            node = trie
+            for char in find:
+                fold = char.casefold() if self.ignore_case else char
+                node = node.setdefault(fold, (char, {}))[1]
+            node[""] = None  # end of a term
+        return self._node_regex(trie)
+
+    def _node_regex(self, node):
+        alternatives = [self._char_regex(char) + self._node_regex(child)
+                        for fold, (char, child) in sorted(item for item in node.items() if item[0])]
+        if not alternatives:
+            return ""
+        regex = alternatives[0] if len(alternatives) == 1 else "(?:" + "|".join(alternatives) + ")"
+        if "" in node:
+            # A shorter term ends here; the greedy optional still prefers the longer ones
+            regex = "(?:" + regex + ")?"
+        return regex
+
+    def _char_regex(self, char):
+        if char == " " and self.whitespace_variations:
+            return r"\s+"
+        return re.escape(char)
+
+    def lookup(self, text):
+        """The (find, replace) pair a matched text belongs to, or None."""
+        return self.replacements.get(self.key(text))
+
+    def replacement(self, match, hits):
+        """Replacement text for one match, counting the hit against its pair (None if it has no pair)."""
+        pair = self.lookup(match.group())
+        if pair is None:
+            return None
+        hits[pair[0]] += 1
+        return pair[1]
+
+    def sub(self, text, hits):
+        """Replace every match in text. Returns the new text."""
+        def substitute(match):
+            new_text = self.replacement(match, hits)
+            return match.group() if new_text is None else new_text
+        return self.pattern.sub(substitute, text)
+
+
+class ParagraphTextIndex:
+    """Maps character offsets in a paragraph's text to the run content holding them.
+
+    Built once per paragraph; every find term is matched against it in a
+    single pass. Replacements edit only the <w:t> nodes a match touches, so
+    run formatting is kept; tabs and breaks are never edited. Takes a
+    python-docx Paragraph or a bare <w:p> element.
+    """
+
+    def __init__(self, paragraph):
+        self.nodes = TEXT_NODES(getattr(paragraph, "_p", paragraph))
+        self._build()
+
+    def _build(self):
+        """(Re)compute the joined text and the start offset of every node."""
+        self.starts = []
+        parts = []
+        position = 0
+        for node in self.nodes:
+            node_text = PLACEHOLDERS.get(node.tag)
+            if node_text is None:
+                node_text = node.text or ""
+            self.starts.append(position)
+            parts.append(node_text)
+            position += len(node_text)
+        self.text = "".join(parts)
+
+    def _text_nodes(self, start, end):
+        """Indexes of the <w:t> nodes overlapping text[start:end]."""
+        first = bisect_right(self.starts, start) - 1
+        last = bisect_right(self.starts, end - 1) - 1
+        return [i for i in range(first, last + 1) if self.nodes[i].tag not in PLACEHOLDERS]
+
+    def _splice(self, indexes, start, end, new_text):
+        """Replace text[start:end] with new_text, keeping it in the first touched run."""
+        for i in indexes:
+            node = self.nodes[i]
+            node_text = node.text or ""
+            offset = self.starts[i]
+            head = node_text[:max(start - offset, 0)]
+            tail = node_text[max(end - offset, 0):]
+            node.text = head + (new_text if i == indexes[0] else "") + tail
+            node.set(XML_SPACE, "preserve")
+
+    def replace(self, table, hits):
+        """Replace every match of the table's terms. Returns the number of replacements."""
+        replaced = 0
+        # Work backwards so the offsets of earlier matches stay valid
+        for match in reversed(list(table.pattern.finditer(self.text))):
+            indexes = self._text_nodes(match.start(), match.end())
+            if not indexes:
+                continue  # Only tabs/breaks matched: nothing to edit
+            new_text = table.replacement(match, hits)
+            if new_text is None:
+                continue
+            self._splice(indexes, match.start(), match.end(), new_text)
+            replaced += 1
+        if replaced:
+            self._build()
+        return replaced
+
+
+def replace_text_in_paragraph(paragraph, table, hits):
+    """Replace text in paragraph in place, keeping the formatting of its runs."""
+    return ParagraphTextIndex(paragraph).replace(table, hits) > 0